@@ -4,32 +4,33 @@
 """
 
 import json
+import sys
 import pandas as pd
 from pathlib import Path
 from collections import Counter
 import re
 from datetime import datetime, timedelta
 
+# リポジトリ直下の共通モジュールを参照
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from rss_io import find_rss_file, iter_rss_articles
+
 def load_rss_data():
-    """RSSデータ読み込み"""
-    weekly_file = Path("data/rss/weekly/weekly_summary_20250613.json")
+    """RSSデータ読み込み（JSON・Parquet どちらでも）"""
+    weekly_file = find_rss_file(Path("data/rss/weekly"), "weekly_summary_20250613")
     
-    if not weekly_file.exists():
+    if weekly_file is None:
         return None, "RSS週次データなし"
     
-    with open(weekly_file, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    
     articles = []
-    for site_name, site_articles in data['sites'].items():
-        for article in site_articles:
-            articles.append({
-                'source_type': 'RSS',
-                'source_name': site_name,
-                'title': article['title'],
-                'summary': article.get('summary', ''),
-                'published': article.get('published', '')
-            })
+    for site_name, article in iter_rss_articles(weekly_file):
+        articles.append({
+            'source_type': 'RSS',
+            'source_name': site_name,
+            'title': article['title'],
+            'summary': article.get('summary', ''),
+            'published': article.get('published', '')
+        })
     
     return articles, f"RSS: {len(articles)}件"
 
@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+"""
+前処理エンジンのベンチマーク
+- 固定フィクスチャ（data/rss/weekly の特定週）と合成コーパスで計測
+- extract_ngrams・match_tools・extract_unknown_words の段階別と process_week 全体
+- スループット（docs/s・n-grams/s）とピークRSS（ケースごとに別プロセスで計測）
+- ベースライン（dataproc/benchmarks/baseline.json）と比較して性能低下・結果の変化を検出
+
+使い方:
+  python dataproc/scripts/benchmark.py                  # ベースラインと比較（低下があれば終了コード1）
+  python dataproc/scripts/benchmark.py --save-baseline  # 現在の結果をベースラインとして保存
+  python dataproc/scripts/benchmark.py --articles 5000 --dict-size 2000  # 合成コーパスの規模を変更
+
+ベースラインは計測したマシンに依存するので、比較は同じ環境で行うこと。
+"""
+
+import argparse
+import gc
+import json
+import multiprocessing
+import platform
+import random
+import resource
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+BASELINE_PATH = Path("dataproc/benchmarks/baseline.json")
+FIXTURE_FILES = [Path("data/rss/weekly/weekly_summary_20260821.json")]  # 固定（最新週に追従させない）
+FIXTURE_DOCS = 1000  # 段階別ベンチマークで使う記事数（先頭から）
+SYNTHETIC_ARTICLES = 1000
+SYNTHETIC_DICT_SIZE = 500  # 合成辞書のツール数（1ツールにつき表記3つ）
+SYNTHETIC_SEED = 42
+REPEAT = 3  # 各段階の最低計測回数（最速値を採用）
+MIN_STAGE_SEC = 1.0  # 短い段階はこの合計時間に達するまで繰り返す（計測のばらつき対策）
+TOLERANCE = 0.2  # 許容する性能低下の割合
+
+THROUGHPUT_KEYS = ['docs_per_sec', 'ngrams_per_sec']
+
+# 合成コーパス用の語彙
+FILLER_WORDS = (
+    "the a new model release update open source agent video image music research team users "
+    "feature launch api support benchmark data training inference platform workflow developer "
+    "company startup funding product demo pricing enterprise cloud local prompt context "
+    "generation editing voice speech code review plugin integration performance latency"
+).split()
+JAPANESE_PHRASES = [
+    "新しいモデルを公開しました", "生成AIの活用事例を紹介", "画像生成ツールを比較してみた",
+    "動画編集を自動化する方法", "エージェント機能が追加された", "料金プランが改定",
+]
+SYLLABLES = ["ka", "zen", "lo", "mi", "tra", "vex", "no", "qua", "ri", "so", "phi", "dax", "ul", "mo", "ter"]
+GENRES = ['multi-ai', 'image', 'video', 'music', 'voice', 'research', 'coding', 'agent-workflow']
+
+
+def generate_dictionary(n_tools, seed=SYNTHETIC_SEED):
+    """tools.yml と同じ形式の合成辞書（canonical・大文字表記・バージョン表記）"""
+    rng = random.Random(seed)
+    tools = []
+    seen = set()
+    while len(tools) < n_tools:
+        name = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+        if name in seen:
+            continue
+        seen.add(name)
+        tools.append({
+            'canonical': name,
+            'variants': [name.capitalize(), name.upper()],
+            'versions': [f"{name.capitalize()}-{rng.randint(1, 9)}"],
+            'genre': rng.choice(GENRES),
+        })
+    return tools
+
+
+def mutate(word, rng):
+    """1文字の置換・削除・重複（表記ゆれ）"""
+    i = rng.randrange(len(word))
+    op = rng.choice(("replace", "delete", "double"))
+    if op == "replace":
+        return word[:i] + rng.choice("abcdefghijklmnopqrstuvwxyz") + word[i + 1:]
+    if op == "delete" and len(word) > 3:
+        return word[:i] + word[i + 1:]
+    return word[:i] + word[i] + word[i:]
+
+
+def generate_corpus(n_articles, tools, seed=SYNTHETIC_SEED, words_per_article=80, mention_rate=0.03, typo_rate=0.2):
+    """合成記事（英語の語の並び＋日本語の定型文＋ツール名・表記ゆれ）"""
+    rng = random.Random(seed)
+    names = [name for tool in tools for name in [tool['canonical'], *tool['variants'], *tool['versions']]]
+    docs = []
+    for i in range(n_articles):
+        words = []
+        for _ in range(words_per_article):
+            roll = rng.random()
+            if roll < mention_rate:
+                name = rng.choice(names)
+                words.append(mutate(name, rng) if rng.random() < typo_rate else name)
+            elif roll < mention_rate + 0.02:
+                words.append(rng.choice(JAPANESE_PHRASES))
+            else:
+                words.append(rng.choice(FILLER_WORDS))
+        docs.append({'source': "rss", 'site': f"synthetic-{i % 20}", 'content': " ".join(words)})
+    return docs
+
+
+def peak_rss_mb():
+    """このプロセスのピークRSS（MB）"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux は KB、macOS は bytes
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def best_of(repeat, func):
+    """repeat 回以上（合計 MIN_STAGE_SEC 以上）実行して最速の経過時間と結果を返す"""
+    best = None
+    result = None
+    total = 0.0
+    runs = 0
+    while runs < repeat or total < MIN_STAGE_SEC:
+        gc.collect()
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+        total += elapsed
+        runs += 1
+    return best, result
+
+
+def throughput(seconds, docs, ngrams):
+    """経過時間と件数からスループットを計算"""
+    return {
+        'seconds': round(seconds, 4),
+        'docs': docs,
+        'ngrams': ngrams,
+        'docs_per_sec': round(docs / seconds, 1) if seconds else 0.0,
+        'ngrams_per_sec': round(ngrams / seconds, 1) if seconds else 0.0,
+    }
+
+
+def make_processor(tools=None):
+    """キャッシュなし・Fuzzy単一スレッドの DataProcessor（tools 指定時は合成辞書）"""
+    from preprocess import DataProcessor
+    from tools_dict import CompiledDict, build_state
+
+    compiled = CompiledDict(build_state(tools, "synthetic")) if tools is not None else None
+    processor = DataProcessor(use_cache=False, fuzzy_workers=1, compiled_dict=compiled)
+    processor.log.limit = 0  # 計測中は [WARN] 等を表示しない
+    return processor
+
+
+def load_fixture_docs(processor, limit=FIXTURE_DOCS):
+    """フィクスチャから先頭 limit 件の文書"""
+    docs = []
+    for doc in processor.iter_input_documents(FIXTURE_FILES):
+        if doc['content']:
+            docs.append(doc)
+        if len(docs) >= limit:
+            break
+    return docs
+
+
+def bench_stages(processor, docs, repeat):
+    """extract_ngrams・extract_candidate_ngrams・match_tools・extract_unknown_words を段階別に計測"""
+    cleaned = [processor.clean_text(doc['content']) for doc in docs]
+    results = {}
+
+    seconds, ngram_lists = best_of(repeat, lambda: [processor.extract_ngrams(text) for text in cleaned])
+    total_ngrams = sum(len(ngrams) for ngrams in ngram_lists)
+    results['extract_ngrams'] = throughput(seconds, len(docs), total_ngrams)
+
+    # ツール照合に回す n-gram（辞書と一致しえない 2-gram・3-gram を枝刈り）
+    seconds, candidate_lists = best_of(repeat, lambda: [processor.extract_candidate_ngrams(text) for text in cleaned])
+    total_candidates = sum(len(candidates) for candidates in candidate_lists)
+    results['extract_candidate_ngrams'] = throughput(seconds, len(docs), total_candidates)
+
+    def run_match_tools():
+        matched = Counter()
+        for text, ngrams in zip(cleaned, candidate_lists):
+            exact_counts = processor.count_exact_matches(text)
+            matched.update(processor.match_tools(ngrams, exact_counts))
+        return matched
+
+    # 2回目以降は長さ別の候補表などが構築済みの状態（実運用の週処理と同じ）
+    seconds, matched = best_of(repeat, run_match_tools)
+    results['match_tools'] = throughput(seconds, len(docs), total_candidates)
+    results['match_tools']['matches'] = sum(matched.values())  # 結果が変わっていないかの確認用
+
+    fuzzy_lists = [processor.fuzzy_match_ngrams(Counter(candidates)) for candidates in candidate_lists]
+    seconds, unknown_lists = best_of(repeat, lambda: [
+        processor.extract_unknown_words(ngrams, fuzzy_matches)
+        for ngrams, fuzzy_matches in zip(ngram_lists, fuzzy_lists)
+    ])
+    results['extract_unknown_words'] = throughput(seconds, len(docs), total_ngrams)
+    results['extract_unknown_words']['unknown'] = sum(len(unknown) for unknown in unknown_lists)
+
+    return results
+
+
+def run_case(name, options):
+    """1ケースを実行（ピークRSSを分けるため別プロセスで呼ばれる）"""
+    start = time.perf_counter()
+
+    if name == "fixture":
+        processor = make_processor()
+        docs = load_fixture_docs(processor, options['fixture_docs'])
+        results = bench_stages(processor, docs, options['repeat'])
+
+    elif name == "synthetic":
+        tools = generate_dictionary(options['dict_size'])
+        processor = make_processor(tools)
+        docs = generate_corpus(options['articles'], tools)
+        results = bench_stages(processor, docs, options['repeat'])
+
+    elif name == "process_week":
+        processor = make_processor()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            week_start = time.perf_counter()
+            processor.process_week(FIXTURE_FILES, "benchmark", processed_dir=tmp_dir)
+            seconds = time.perf_counter() - week_start
+        results = {'process_week': throughput(seconds, processor.stats['documents'], processor.stats['ngrams'])}
+        results['process_week']['records'] = processor.stats['records']
+
+    else:
+        raise ValueError(f"Unknown benchmark case: {name}")
+
+    return {
+        'stages': results,
+        'peak_rss_mb': peak_rss_mb(),
+        'total_sec': round(time.perf_counter() - start, 2),
+    }
+
+
+def run_all(options):
+    """全ケースを1つずつ新しいプロセスで実行"""
+    context = multiprocessing.get_context("spawn")
+    results = {}
+    for name in ("fixture", "synthetic", "process_week"):
+        print(f"Running {name}...")
+        with context.Pool(1) as pool:
+            results[name] = pool.apply(run_case, (name, options))
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """ベースラインとの比較（性能低下・RSS増加・結果の変化を列挙）"""
+    problems = []
+    for case, result in results.items():
+        base_case = baseline.get('cases', {}).get(case)
+        if base_case is None:
+            continue
+
+        for stage, metrics in result['stages'].items():
+            base = base_case['stages'].get(stage)
+            if base is None:
+                continue
+            for key in THROUGHPUT_KEYS:
+                if base.get(key) and metrics[key] < base[key] * (1 - tolerance):
+                    problems.append(f"{case}/{stage}: {key} {metrics[key]} < baseline {base[key]}")
+            for key in ('ngrams', 'matches', 'unknown', 'records'):
+                if key in base and metrics.get(key) != base[key]:
+                    problems.append(f"{case}/{stage}: {key} changed {base[key]} -> {metrics.get(key)}")
+
+        base_rss = base_case.get('peak_rss_mb')
+        if base_rss and result['peak_rss_mb'] > base_rss * (1 + tolerance):
+            problems.append(f"{case}: peak RSS {result['peak_rss_mb']} MB > baseline {base_rss} MB")
+
+    return problems
+
+
+def print_results(results, baseline):
+    """結果の表示（ベースラインがあれば比率も）"""
+    for case, result in results.items():
+        print(f"\n{case} (peak RSS {result['peak_rss_mb']} MB, {result['total_sec']} s)")
+        base_stages = baseline.get('cases', {}).get(case, {}).get('stages', {})
+        for stage, metrics in result['stages'].items():
+            line = (f"  {stage:<22} {metrics['docs_per_sec']:>10.1f} docs/s "
+                    f"{metrics['ngrams_per_sec']:>12.1f} n-grams/s")
+            base = base_stages.get(stage)
+            if base and base.get('docs_per_sec'):
+                line += f"  ({metrics['docs_per_sec'] / base['docs_per_sec']:.2f}x baseline)"
+            print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the preprocessing engine')
+    parser.add_argument('--save-baseline', action='store_true', help='Save results as the new baseline')
+    parser.add_argument('--baseline', type=Path, default=BASELINE_PATH, help='Baseline JSON path')
+    parser.add_argument('--articles', type=int, default=SYNTHETIC_ARTICLES, help='Synthetic article count')
+    parser.add_argument('--dict-size', type=int, default=SYNTHETIC_DICT_SIZE, help='Synthetic dictionary size (tools)')
+    parser.add_argument('--fixture-docs', type=int, default=FIXTURE_DOCS, help='Fixture documents for stage benchmarks')
+    parser.add_argument('--repeat', type=int, default=REPEAT, help='Repetitions per stage (fastest is kept)')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE, help='Allowed slowdown ratio before failing')
+    args = parser.parse_args()
+
+    options = {
+        'articles': args.articles,
+        'dict_size': args.dict_size,
+        'fixture_docs': args.fixture_docs,
+        'repeat': args.repeat,
+    }
+
+    baseline = {}
+    if args.baseline.exists():
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('options') != options:
+            print(f"Warning: options differ from baseline {baseline.get('options')}, skipping comparison")
+            baseline = {}
+
+    results = run_all(options)
+    print_results(results, baseline)
+
+    if args.save_baseline:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump({
+                'options': options,
+                'environment': {
+                    'python': platform.python_version(),
+                    'platform': platform.platform(),
+                    'cpu_count': multiprocessing.cpu_count(),
+                },
+                'cases': results,
+            }, f, ensure_ascii=False, indent=2)
+        print(f"\nBaseline saved: {args.baseline}")
+        return
+
+    if not baseline:
+        print("\nNo baseline to compare (run with --save-baseline first)")
+        return
+
+    problems = compare(results, baseline, args.tolerance)
+    if problems:
+        print("\nRegressions:")
+        for problem in problems:
+            print(f"  {problem}")
+        sys.exit(1)
+    print("\nNo regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
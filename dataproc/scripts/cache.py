@@ -0,0 +1,121 @@
+"""
+前処理用の永続キャッシュ（SQLite）
+- フィンガープリント（辞書ハッシュ・パラメータ等）が変わったら自動で全破棄
+- 件数上限を超えた分は最終利用が古い順に削除（LRU、メモリ上の写しも同じ件数まで）
+- ヒット・ミス数は呼び出し側で数える（--workers のワーカー分も合わせて集計するため）
+"""
+
+import sqlite3
+import time
+from pathlib import Path
+
+CACHE_DIR = Path("dataproc/cache")
+QUERY_CHUNK = 500  # SQLiteのプレースホルダ上限対策
+
+
+class PersistentCache:
+    """キー → 値（bytes/str）の永続LRUキャッシュ"""
+
+    def __init__(self, path, fingerprint, max_entries):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+
+        self.pending = {}
+        self.touched = set()
+        self.memory = {}  # 最近読み書きした分（文書ごとの再問い合わせを省く、挿入順 = 利用順で max_entries 件まで）
+
+        self.conn = sqlite3.connect(str(self.path), timeout=60)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value BLOB, last_used INTEGER)"
+        )
+
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'fingerprint'").fetchone()
+        if row is None or row[0] != fingerprint:
+            # 辞書・パラメータ変更時は全件無効
+            if row is not None:
+                print(f"Cache invalidated: {self.path}")
+            self.conn.execute("DELETE FROM entries")
+            self.conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('fingerprint', ?)", (fingerprint,)
+            )
+        self.conn.commit()
+
+    def get_many(self, keys):
+        """一括取得（見つかったものだけ返す）"""
+        keys = list(keys)
+        found = {}
+        for key in keys:
+            if key in self.memory:
+                found[key] = self._remember(key, self.memory.pop(key))
+        lookup = [key for key in keys if key not in found]
+
+        for start in range(0, len(lookup), QUERY_CHUNK):
+            chunk = lookup[start:start + QUERY_CHUNK]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self.conn.execute(
+                f"SELECT key, value FROM entries WHERE key IN ({placeholders})", chunk
+            )
+            for key, value in rows:
+                found[key] = self._remember(key, value)
+                self.touched.add(key)
+
+        return found
+
+    def put_many(self, items):
+        """一括登録（flushで書き込み）"""
+        for key, value in items:
+            self.pending[key] = value
+            self._remember(key, value)
+
+    def _remember(self, key, value):
+        """メモリ上の写しに最新として追加（上限を超えたら最も古く使った分を捨てる）→ value"""
+        self.memory.pop(key, None)
+        self.memory[key] = value
+        if len(self.memory) > self.max_entries:
+            del self.memory[next(iter(self.memory))]
+        return value
+
+    def drain(self):
+        """未書き込みの新規エントリと利用キーを取り出す（ワーカープロセス → 親プロセスへの受け渡し用）"""
+        pending, touched = self.pending, self.touched
+        self.pending, self.touched = {}, set()
+        return pending, touched
+
+    def merge(self, pending, touched):
+        """drain() の結果を取り込む（書き込みは親プロセスだけが行う）"""
+        self.put_many(pending.items())
+        self.touched.update(touched)
+
+    def flush(self):
+        """新規エントリ書き込み・最終利用時刻更新・上限超過分の削除"""
+        now = int(time.time())
+
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO entries (key, value, last_used) VALUES (?, ?, ?)",
+                ((key, value, now) for key, value in self.pending.items()),
+            )
+            self.conn.executemany(
+                "UPDATE entries SET last_used = ? WHERE key = ?",
+                ((now, key) for key in self.touched if key not in self.pending),
+            )
+
+            total = self.conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            overflow = total - self.max_entries
+            if overflow > 0:
+                # 同じ時刻どうしは先に書き込んだ方（rowid が小さい方）から削除
+                self.conn.execute(
+                    "DELETE FROM entries WHERE key IN "
+                    "(SELECT key FROM entries ORDER BY last_used, rowid LIMIT ?)",
+                    (overflow,),
+                )
+
+        self.pending.clear()
+        self.touched.clear()
+
+    def close(self):
+        """書き込みして閉じる"""
+        self.flush()
+        self.conn.close()
@@ -0,0 +1,153 @@
+"""
+近似重複記事のまとめ上げ（MinHash + LSH）
+- 文字 k-gram の集合で類似度（Jaccard）を近似し、閾値以上の記事を1クラスタにまとめる
+- 文書を順に受け取り、既存クラスタの代表と似ていなければ新しい代表として通す（入力順で先勝ち）
+- クラスタの重複件数は後から duplicates() で参照
+- select で対象の文書を絞れる（対象外の文書は照合せず入力順のまま通す）
+"""
+
+from contextlib import nullcontext
+
+import numpy as np
+
+NUM_PERM = 64       # MinHash の関数の数（推定誤差の標準偏差 ≒ sqrt(s(1-s)/NUM_PERM)）
+SHINGLE_SIZE = 5    # 文字 k-gram の長さ（日本語・英語共通）
+MAX_CHARS = 2000    # 先頭この文字数だけで比較（長文の転載も冒頭でほぼ判定できる）
+BATCH_CHARS = 16384  # 署名をまとめて計算する文字数（一時配列 ≒ この値 × NUM_PERM × 8 bytes）
+MIN_RECALL = 0.95   # 閾値ちょうどの類似度の組が候補に上がる確率の下限
+HASH_PRIME = np.uint64(1099511628211)
+
+
+def choose_bands(num_perm, threshold, min_recall=MIN_RECALL):
+    """LSH のバンド数・行数を選ぶ
+
+    類似度 s の組が候補になる確率は 1 - (1 - s^rows)^bands。
+    閾値ちょうどの組を min_recall 以上で拾える組み合わせのうち、
+    行数が最大（＝無関係な組が候補に上がりにくい）ものを使う。
+    """
+    best = (num_perm, 1)
+    for rows in range(1, num_perm + 1):
+        bands = num_perm // rows
+        recall = 1 - (1 - threshold ** rows) ** bands
+        if recall >= min_recall:
+            best = (bands, rows)
+    return best
+
+
+class NearDuplicateFilter:
+    """MinHash 署名の LSH インデックスによる逐次クラスタリング"""
+
+    def __init__(self, threshold, num_perm=NUM_PERM, shingle_size=SHINGLE_SIZE, seed=1):
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.bands, self.rows = choose_bands(num_perm, threshold)
+
+        rng = np.random.default_rng(seed)
+        self.mult = rng.integers(1, 2 ** 63, size=num_perm, dtype=np.uint64) | np.uint64(1)
+        self.offset = rng.integers(0, 2 ** 63, size=num_perm, dtype=np.uint64)
+
+        self.buckets = [{} for _ in range(self.bands)]  # バンドごとに 署名の一部 → 代表IDのリスト
+        self.signatures_by_id = []  # 代表ID → 署名
+        self.cluster_sizes = []  # 代表ID → クラスタの記事数
+
+    def signatures(self, texts):
+        """複数テキストの MinHash 署名をまとめて計算（行 = テキスト）
+
+        正規化（小文字化・空白の統一）したテキストの文字 k-gram を多項式ハッシュにし、
+        各ハッシュ関数での最小値を署名とする。
+        """
+        k = self.shingle_size
+        # k文字未満のテキストも k-gram が1つできるように埋める
+        texts = [" ".join(text[:MAX_CHARS].lower().split()).ljust(k, "\0") for text in texts]
+        lengths = np.array([len(text) for text in texts], dtype=np.int64)
+        codes = np.frombuffer("".join(texts).encode('utf-32-le'), dtype=np.uint32).astype(np.uint64)
+
+        # 連結した全文で k-gram ハッシュを計算（uint64 のオーバーフローで mod 2^64）
+        n = len(codes) - k + 1
+        hashes = np.zeros(n, dtype=np.uint64)
+        for j in range(k):
+            hashes = hashes * HASH_PRIME + codes[j:j + n]
+
+        # テキストの境界をまたぐ k-gram を除いて、テキストごとに最小値を取る
+        counts = lengths - k + 1
+        text_starts = np.cumsum(lengths) - lengths
+        shingle_starts = np.cumsum(counts) - counts
+        positions = np.arange(counts.sum()) + np.repeat(text_starts - shingle_starts, counts)
+        shingles = hashes[positions]
+        values = self.mult[:, None] * shingles[None, :] + self.offset[:, None]
+        return np.minimum.reduceat(values, shingle_starts, axis=1).T
+
+    def assign(self, signature):
+        """署名を既存クラスタに入れるか新しい代表にする → (クラスタID, 新規か)"""
+        raw = signature.tobytes()
+        width = self.rows * signature.itemsize
+        keys = [raw[i * width:(i + 1) * width] for i in range(self.bands)]
+
+        # 候補（いずれかのバンドが一致した代表）のうち、推定類似度が閾値以上で最も高いもの
+        candidates = set()
+        for bucket, key in zip(self.buckets, keys):
+            candidates.update(bucket.get(key, ()))
+        best_id, best_similarity = None, 0.0
+        for cluster_id in sorted(candidates):
+            similarity = float(np.mean(self.signatures_by_id[cluster_id] == signature))
+            if similarity >= self.threshold and similarity > best_similarity:
+                best_id, best_similarity = cluster_id, similarity
+
+        if best_id is not None:
+            self.cluster_sizes[best_id] += 1
+            return best_id, False
+
+        cluster_id = len(self.signatures_by_id)
+        self.signatures_by_id.append(signature)
+        self.cluster_sizes.append(1)
+        for bucket, key in zip(self.buckets, keys):
+            bucket.setdefault(key, []).append(cluster_id)
+        return cluster_id, True
+
+    def filter(self, docs, select=None, stage=None):
+        """代表の文書だけを返す（doc['cluster_id'] を付与、本文なし・select(doc) が偽の文書はそのまま）
+
+        署名は BATCH_CHARS 文字分ずつまとめて計算するので、その分だけ先読みする。
+        stage を渡すと照合の区間だけを with stage(): で囲む（入力の読み込みは含めない）。
+        """
+        select = select or (lambda doc: True)
+        stage = stage or nullcontext
+        batch = []
+        batch_chars = 0
+        for doc in docs:
+            target = bool(doc.get('content')) and select(doc)
+            batch.append((doc, target))
+            if target:
+                batch_chars += min(len(doc['content']), MAX_CHARS)
+            if batch_chars >= BATCH_CHARS:
+                yield from self._filter_batch(batch, stage)
+                batch = []
+                batch_chars = 0
+        yield from self._filter_batch(batch, stage)
+
+    def _filter_batch(self, batch, stage):
+        """先読みした文書をまとめて署名計算し、入力順にクラスタへ割り当て"""
+        with stage():
+            texts = [doc['content'] for doc, target in batch if target]
+            signatures = iter(self.signatures(texts)) if texts else iter(())
+            kept = []
+            for doc, target in batch:
+                if not target:
+                    kept.append(doc)
+                    continue
+                cluster_id, is_new = self.assign(next(signatures))
+                if is_new:
+                    doc['cluster_id'] = cluster_id
+                    kept.append(doc)
+        yield from kept
+
+    def duplicates(self, cluster_id):
+        """代表以外にまとめた記事数"""
+        if cluster_id is None:
+            return 0
+        return self.cluster_sizes[cluster_id] - 1
+
+    def total_duplicates(self):
+        """まとめた記事数の合計"""
+        return sum(self.cluster_sizes) - len(self.cluster_sizes)
@@ -0,0 +1,76 @@
+"""
+前処理の入出力マニフェスト
+- 出力（週ごとの parquet）ごとに、入力ファイルのハッシュ・辞書ハッシュ・処理パラメータを記録
+- 記録と一致し出力ファイルも残っていれば再処理不要と判定
+"""
+
+import hashlib
+import json
+from pathlib import Path
+
+MANIFEST_PATH = Path("dataproc/processed/manifest.json")
+HASH_CHUNK_SIZE = 1 << 20  # 1MBずつ読み込み
+
+
+def hash_file(path):
+    """ファイル内容の sha256"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class Manifest:
+    """出力日付 → {inputs, tools_hash, params, outputs} の記録"""
+
+    def __init__(self, path=MANIFEST_PATH):
+        self.path = Path(path)
+        self.entries = {}
+        if self.path.exists():
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Warning: failed to load {self.path}: {e}")
+
+    def fingerprint(self, input_files, tools_hash, params):
+        """出力を決める条件（入力ファイルのハッシュ・辞書・パラメータ）"""
+        return {
+            'inputs': {str(path): hash_file(path) for path in input_files},
+            'tools_hash': tools_hash,
+            'params': params,
+        }
+
+    def _matches(self, entry, fingerprint):
+        """記録が条件と一致し、出力ファイルもすべて残っているか"""
+        if entry is None:
+            return False
+        if any(entry.get(key) != value for key, value in fingerprint.items()):
+            return False
+        return all(Path(output).exists() for output in entry.get('outputs', []))
+
+    def is_current(self, output_date, fingerprint):
+        """output_date の出力が同じ条件で作成済みか"""
+        return self._matches(self.entries.get(output_date), fingerprint)
+
+    def find_same(self, fingerprint):
+        """同じ条件で作成済みの別日付の出力（なければ None）"""
+        for output_date, entry in sorted(self.entries.items(), reverse=True):
+            if self._matches(entry, fingerprint):
+                return output_date, entry
+        return None
+
+    def record(self, output_date, fingerprint, outputs):
+        """処理結果を記録（save で書き込み）"""
+        entry = dict(fingerprint)
+        entry['outputs'] = [str(output) for output in outputs]
+        self.entries[output_date] = entry
+
+    def save(self):
+        """JSON保存（途中で落ちても壊れないように一時ファイル経由）"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(dict(sorted(self.entries.items())), f, ensure_ascii=False, indent=2)
+        tmp_path.replace(self.path)
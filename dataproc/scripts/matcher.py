@@ -0,0 +1,480 @@
+"""
+ツール名マッチングエンジン
+- Aho-Corasick による完全一致の一括検索（1文書1パス）
+- トークン境界チェック付き（英字・数字・ひらがな・カタカナ・漢字の字種境界）
+- Fuzzyマッチング用ブロッキングインデックス（文字3-gram転置＋長さ制約）
+- 複数語 n-gram の枝刈り（先頭語・末尾語と辞書の接頭辞・接尾辞の距離の下限）
+"""
+
+import re
+from collections import Counter, defaultdict, deque
+
+import numpy as np
+from rapidfuzz import fuzz, process
+from rapidfuzz.distance import LCSseq
+
+DECIMAL_SEPARATORS = "."  # 数字に挟まれたら境界にしない文字（clean_text 後に残るのは「.」だけ）
+TRUNCATE_STEP = 8  # NgramPruner で choice を切り詰める長さの刻み（語の長さを切り上げてまとめて計算）
+
+
+def clean_text(text):
+    """テキストクレンジング（改良版）"""
+    # HTMLタグ除去
+    text = re.sub(r'<[^>]+>', '', text)
+    
+    # URL除去
+    text = re.sub(r'https?://\S+', '', text)
+    
+    # 重要：ハイフンとドットは保持（GPT-4、Claude-3、v6.1等のため）
+    # 英数字、ハイフン、ドット、スペース以外を除去
+    text = re.sub(r'[^\w\s\-\.]', ' ', text)
+    
+    # 連続空白を単一に
+    text = re.sub(r'\s+', ' ', text)
+    
+    return text.strip()
+
+
+def char_class(ch):
+    """境界判定用の字種（Noneは空白・記号などの区切り文字）"""
+    if ch is None:
+        return None
+    code = ord(ch)
+    if 0x3040 <= code <= 0x309F:
+        return "hiragana"
+    if 0x30A0 <= code <= 0x30FF or 0xFF66 <= code <= 0xFF9F:
+        return "katakana"
+    if 0x4E00 <= code <= 0x9FFF or 0x3400 <= code <= 0x4DBF:
+        return "kanji"
+    if ch.isdigit():
+        return "digit"
+    if ch.isalpha() or ch == "_":
+        return "alpha"
+    return None
+
+
+def is_boundary(text, i):
+    """text[i-1] と text[i] の間がトークン境界か（形態素解析と同じく英字→数字も境界）
+
+    小数（4.8）の途中は境界にしない（Claude Opus 4 が Claude Opus 4.8 に一致しないように）
+    """
+    left = char_class(text[i - 1]) if i > 0 else None
+    right = char_class(text[i]) if i < len(text) else None
+    if left == "digit" and text[i:i + 1] in DECIMAL_SEPARATORS and text[i + 1:i + 2].isdigit():
+        return False
+    if right == "digit" and i >= 2 and text[i - 1] in DECIMAL_SEPARATORS and text[i - 2].isdigit():
+        return False
+    return left is None or right is None or left != right
+
+
+class ExactMatcher:
+    """Aho-Corasick オートマトンによる複数パターン完全一致"""
+
+    def __init__(self, patterns):
+        """patterns: {検索文字列: variant名}"""
+        self.keys = []
+        self.variants = []
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [()]
+
+        for key, variant in patterns.items():
+            if not key:
+                continue
+            self._add(key, variant)
+
+        self._build_failure_links()
+
+    def _add(self, key, variant):
+        """トライにパターンを追加"""
+        node = 0
+        for ch in key:
+            next_node = self.goto[node].get(ch)
+            if next_node is None:
+                next_node = len(self.goto)
+                self.goto[node][ch] = next_node
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append(())
+            node = next_node
+
+        self.output[node] = self.output[node] + (len(self.keys),)
+        self.keys.append(key)
+        self.variants.append(variant)
+
+    def _build_failure_links(self):
+        """BFSで失敗遷移と出力リンクを構築"""
+        queue = deque()
+        for next_node in self.goto[0].values():
+            queue.append(next_node)
+
+        while queue:
+            node = queue.popleft()
+            for ch, next_node in self.goto[node].items():
+                queue.append(next_node)
+
+                state = self.fail[node]
+                while state and ch not in self.goto[state]:
+                    state = self.fail[state]
+                self.fail[next_node] = self.goto[state].get(ch, 0)
+
+                # 失敗先で終わるパターンも出力に含める
+                self.output[next_node] = self.output[next_node] + self.output[self.fail[next_node]]
+
+    def find_all(self, text):
+        """境界条件を満たす全一致 (start, end, パターン番号) を列挙"""
+        goto = self.goto
+        fail = self.fail
+        output = self.output
+        keys = self.keys
+
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+
+            for pattern_id in output[node]:
+                end = i + 1
+                start = end - len(keys[pattern_id])
+                if is_boundary(text, start) and is_boundary(text, end):
+                    yield start, end, pattern_id
+
+    def count(self, text, min_length=0):
+        """variant別の完全一致回数（最左最長・重なりなし、min_length未満の表記は対象外）"""
+        matches = sorted(
+            (m for m in self.find_all(text) if m[1] - m[0] >= min_length),
+            key=lambda m: (m[0], -(m[1] - m[0])),
+        )
+
+        counts = Counter()
+        last_end = 0
+        for start, end, pattern_id in matches:
+            if start < last_end:
+                continue
+            counts[self.variants[pattern_id]] += 1
+            last_end = end
+
+        return counts
+
+
+class FuzzyMatcher:
+    """fuzz.ratio の閾値から導いた候補絞り込み＋cdist一括スコアリング
+
+    インデックスは閾値に依存しないので、辞書ごとに1回だけ構築すればよい。
+    fuzz.ratio >= min_score となるには Indel距離 d が
+    d <= (100 - min_score) / 100 * (len1 + len2) を満たす必要がある。
+    - 長さ制約: |len1 - len2| <= d
+    - q-gram補題: 共有q-gram数 >= max(len1, len2) - q + 1 - q * d
+    どちらも必要条件なので、閾値以上の候補を取りこぼすことはない。
+    """
+
+    def __init__(self, choices, q=3, batch_size=4096):
+        self.choices = list(choices)
+        self.q = q
+        self.batch_size = batch_size
+
+        self.choice_lengths = np.array([len(c) for c in self.choices], dtype=np.int64)
+        self.length_plans = {}
+        self._build_postings()
+
+    def _layered_grams(self, text):
+        """q-gramを出現回数つきで列挙（同じq-gramの2回目は (gram, 2)）"""
+        q = self.q
+        seen = {}
+        grams = []
+        for i in range(len(text) - q + 1):
+            gram = text[i:i + q]
+            k = seen.get(gram, 0) + 1
+            seen[gram] = k
+            grams.append((gram, k))
+        return grams
+
+    def _build_postings(self):
+        """(q-gram, 出現回数) → choice番号 の転置インデックス（CSR形式）"""
+        postings = {}
+        for choice_id, choice in enumerate(self.choices):
+            for key in self._layered_grams(choice):
+                postings.setdefault(key, []).append(choice_id)
+
+        self.gram_ids = {}
+        offsets = [0]
+        choice_ids = []
+        for gram_id, (key, ids) in enumerate(postings.items()):
+            self.gram_ids[key] = gram_id
+            choice_ids.extend(ids)
+            offsets.append(len(choice_ids))
+
+        self.post_offsets = np.array(offsets, dtype=np.int64)
+        self.post_choices = np.array(choice_ids, dtype=np.int64)
+
+    @staticmethod
+    def max_distance(total_length, min_score):
+        """閾値を満たすIndel距離の上限"""
+        return np.floor((100 - min_score) * total_length / 100 + 1e-9).astype(np.int64)
+
+    def _length_plan(self, length, min_score):
+        """q-gramで絞れない（必要共有数 <= 0）候補を長さごとに前計算"""
+        plan = self.length_plans.get((length, min_score))
+        if plan is None:
+            lengths = self.choice_lengths
+            d_max = self.max_distance(length + lengths, min_score)
+            required = np.maximum(length, lengths) - self.q + 1 - self.q * d_max
+            ok = (np.abs(length - lengths) <= d_max) & (required <= 0)
+            plan = np.nonzero(ok)[0]
+            self.length_plans[(length, min_score)] = plan
+        return plan
+
+    def candidate_pairs(self, queries, min_score):
+        """絞り込み後の (query番号, choice番号) 配列"""
+        query_ids = []
+        gram_ids = []
+        always_q = []
+        always_c = []
+
+        for query_id, query in enumerate(queries):
+            for key in self._layered_grams(query):
+                gram_id = self.gram_ids.get(key)
+                if gram_id is not None:
+                    query_ids.append(query_id)
+                    gram_ids.append(gram_id)
+
+            plan = self._length_plan(len(query), min_score)
+            if len(plan):
+                always_q.append(np.full(len(plan), query_id, dtype=np.int64))
+                always_c.append(plan)
+
+        n_choices = len(self.choices)
+        pair_q = []
+        pair_c = []
+
+        if query_ids:
+            query_ids = np.array(query_ids, dtype=np.int64)
+            gram_ids = np.array(gram_ids, dtype=np.int64)
+
+            # 転置リストを展開して (query, choice) ごとの共有q-gram数を数える
+            starts = self.post_offsets[gram_ids]
+            counts = self.post_offsets[gram_ids + 1] - starts
+            total = int(counts.sum())
+            ends = np.cumsum(counts)
+            positions = np.arange(total, dtype=np.int64) - np.repeat(ends - counts - starts, counts)
+            hit_q = np.repeat(query_ids, counts)
+            hit_c = self.post_choices[positions]
+
+            keys, shared = np.unique(hit_q * n_choices + hit_c, return_counts=True)
+            key_q = keys // n_choices
+            key_c = keys % n_choices
+
+            query_lengths = np.array([len(q) for q in queries], dtype=np.int64)[key_q]
+            choice_lengths = self.choice_lengths[key_c]
+            d_max = self.max_distance(query_lengths + choice_lengths, min_score)
+            required = np.maximum(query_lengths, choice_lengths) - self.q + 1 - self.q * d_max
+            keep = (np.abs(query_lengths - choice_lengths) <= d_max) & (shared >= required)
+            pair_q.append(key_q[keep])
+            pair_c.append(key_c[keep])
+
+        pair_q.extend(always_q)
+        pair_c.extend(always_c)
+        if not pair_q:
+            empty = np.array([], dtype=np.int64)
+            return empty, empty
+        return np.concatenate(pair_q), np.concatenate(pair_c)
+
+    def best_matches(self, queries, min_score, workers=-1):
+        """閾値以上の最良一致 {query: (choice, score)}（process.extractOne と同じ結果）"""
+        queries = list(queries)
+        results = {}
+
+        for start in range(0, len(queries), self.batch_size):
+            batch = queries[start:start + self.batch_size]
+            pair_q, pair_c = self.candidate_pairs(batch, min_score)
+            if not len(pair_q):
+                continue
+
+            # 候補を持つqueryだけを、候補choiceの和集合に対して一括スコアリング
+            survivor_ids = np.unique(pair_q)
+            choice_ids = np.unique(pair_c)
+            scores = process.cdist(
+                [batch[i] for i in survivor_ids],
+                [self.choices[i] for i in choice_ids],
+                scorer=fuzz.ratio,
+                score_cutoff=min_score,
+                dtype=np.float64,
+                workers=workers,
+            )
+
+            best = scores.argmax(axis=1)  # 同点は辞書順で先のchoice
+            best_scores = scores[np.arange(len(survivor_ids)), best]
+            for row in np.nonzero(best_scores >= min_score)[0]:
+                query = batch[survivor_ids[row]]
+                results[query] = (self.choices[choice_ids[best[row]]], float(best_scores[row]))
+
+        return results
+
+
+class NgramPruner:
+    """複数語 n-gram の Fuzzy 候補を先頭語・末尾語だけで枝刈り
+
+    n-gram q = "t1 ... tn" と choice c の Indel距離は、
+    P(t1, c) = min_j Indel("t1 ", c[:j]) と S(tn, c) = min_j Indel(" tn", c[j:]) の和以上になる
+    （最適な対応での c の切れ目を当てはめると、それぞれの最小値以下になるため）。
+    長さ制約を満たす choice すべてで P + S が距離の上限を超える n-gram は、
+    fuzz.ratio が閾値に届かないのでスコアリング不要（取りこぼしなし）。
+
+    P は下限 len(x) - LCS(x, c[:len(x) + cap]) で代用する（cap は距離の上限の最大値。
+    P <= cap なら最適な接頭辞はこの範囲に収まり、P > cap ならどのみち閾値に届かない）。S も同様。
+    語ごとに1回だけ cdist で求めて保持するので、文書をまたいで出てくる語の計算は1回で済む。
+    """
+
+    def __init__(self, choices, min_score, max_tokens=100_000):
+        # 長さ順に並べ、同じ長さの choice を連続区間にする
+        self.choices = sorted(choices, key=len)
+        self.min_score = min_score
+        self.max_tokens = max_tokens
+        self.choice_lengths = np.array([len(c) for c in self.choices], dtype=np.int64)
+        longest = int(self.choice_lengths.max()) if len(self.choices) else 0
+        self.length_starts = np.searchsorted(self.choice_lengths, np.arange(longest + 2))
+        self.present_lengths = np.nonzero(np.diff(self.length_starts))[0]
+
+        # 長さ制約 |len(q) - len(c)| <= d と d <= scale * (len(q) + len(c)) から、
+        # 距離の上限は 2 * scale * len(c) / (1 - scale) を超えない（保持する距離はこの +1 で飽和）
+        scale = (100 - min_score) / 100
+        self.distance_cap = min(int(2 * scale * longest / (1 - scale)) if scale < 1 else longest, 126)
+        self.saturated = self.distance_cap + 1
+
+        # n-gram長 → 距離の上限 + 1（長さ制約を満たさなければ 0）、choice ごと・choice の長さごと
+        self.choice_limits = np.zeros((0, len(self.choices)), dtype=np.uint8)
+        self.length_limits = np.zeros((0, longest + 1), dtype=np.uint8)
+
+        self.truncated = {}  # 切り詰める長さ → (接頭辞, 接尾辞)
+        self.span_cache = {}  # (語数, n の組) → 連続 n 語の位置
+        self._reset_tokens()
+
+    def _reset_tokens(self, capacity=1024):
+        """語ごとの P・S の保持領域を初期化（行数は足りなくなったら倍に拡張）"""
+        self.token_ids = {}
+        self.prefix_dist = np.zeros((capacity, len(self.choices)), dtype=np.uint8)
+        self.suffix_dist = np.zeros((capacity, len(self.choices)), dtype=np.uint8)
+        # 事前判定用: choice の長さごとの P・S の最小値
+        self.prefix_by_length = np.zeros((capacity, len(self.length_starts) - 1), dtype=np.uint8)
+        self.suffix_by_length = np.zeros((capacity, len(self.length_starts) - 1), dtype=np.uint8)
+
+    def _grow(self, size):
+        """保持領域を size 行以上に拡張"""
+        capacity = len(self.prefix_dist)
+        while capacity < size:
+            capacity *= 2
+        for name in ('prefix_dist', 'suffix_dist', 'prefix_by_length', 'suffix_by_length'):
+            old = getattr(self, name)
+            new = np.zeros((capacity, old.shape[1]), dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def _build_limits(self, max_length):
+        """n-gram長 0〜max_length の距離の上限表"""
+        lengths = np.arange(max_length + 1, dtype=np.int64)[:, None]
+        d_max = FuzzyMatcher.max_distance(lengths + self.choice_lengths, self.min_score)
+        ok = np.abs(lengths - self.choice_lengths) <= d_max
+        self.choice_limits = np.where(ok, np.minimum(d_max, self.distance_cap) + 1, 0).astype(np.uint8)
+
+        # 該当する choice がない長さは 0 のまま
+        choice_lengths = np.arange(len(self.length_starts) - 1)
+        present = np.diff(self.length_starts) > 0
+        d_max = FuzzyMatcher.max_distance(lengths + choice_lengths, self.min_score)
+        ok = (np.abs(lengths - choice_lengths) <= d_max) & present
+        self.length_limits = np.where(ok, np.minimum(d_max, self.distance_cap) + 1, 0).astype(np.uint8)
+
+    def _truncated_choices(self, keep):
+        """先頭（末尾）keep 文字に切り詰めた choice（接頭辞, 接尾辞）"""
+        parts = self.truncated.get(keep)
+        if parts is None:
+            parts = ([c[:keep] for c in self.choices], [c[-keep:] for c in self.choices])
+            self.truncated[keep] = parts
+        return parts
+
+    def _add_tokens(self, tokens):
+        """新しい語の P・S の下限を計算して保持
+
+        choice は語の長さ（TRUNCATE_STEP 単位に切り上げ）+ 距離の上限の最大値に切り詰め、同じ長さの区分ごとに cdist。
+        切り詰める長さが語だけで決まるので、下限は一緒に計算した語・文書の順序によらない
+        （短い語には範囲が広いだけで下限のまま）
+        """
+        start = len(self.token_ids)
+        end = start + len(tokens)
+        if end > len(self.prefix_dist):
+            self._grow(end)
+
+        groups = defaultdict(list)  # 切り詰める長さ → 行
+        for row, token in enumerate(tokens, start):
+            groups[-(-(len(token) + 1) // TRUNCATE_STEP) * TRUNCATE_STEP + self.distance_cap].append(row)
+            self.token_ids[token] = row
+
+        for keep, rows in groups.items():
+            group = [tokens[row - start] for row in rows]
+            lengths = np.array([len(token) + 1 for token in group], dtype=np.int64)[:, None]
+            prefixes, suffixes = self._truncated_choices(keep)
+            for texts, choices, dist, by_length in (
+                ([t + " " for t in group], prefixes, self.prefix_dist, self.prefix_by_length),
+                ([" " + t for t in group], suffixes, self.suffix_dist, self.suffix_by_length),
+            ):
+                similarity = process.cdist(texts, choices, scorer=LCSseq.similarity, dtype=np.int64, workers=1)
+                bound = np.minimum(lengths - similarity, self.saturated).astype(np.uint8)
+                dist[rows] = bound
+                # 該当する choice がない長さは飽和値
+                by_length[rows] = self.saturated
+                by_length[np.ix_(rows, self.present_lengths)] = np.minimum.reduceat(
+                    bound, self.length_starts[self.present_lengths], axis=1)
+
+    def _check(self, first, last, lengths):
+        """(先頭語の行, 末尾語の行, n-gram長) ごとに、いずれかの choice と閾値以上で一致しうるか"""
+        if lengths.max() >= len(self.choice_limits):
+            self._build_limits(int(lengths.max()) * 2)
+
+        # 事前判定: choice の長さごとの最小値どうしの和でも距離の上限を超えるものは除外
+        bound = self.prefix_by_length[first] + self.suffix_by_length[last]
+        result = (bound < self.length_limits[lengths]).any(axis=1)
+        candidates = np.nonzero(result)[0]
+        if len(candidates):
+            # choice ごとに P + S <= 距離の上限
+            bound = self.prefix_dist[first[candidates]] + self.suffix_dist[last[candidates]]
+            result[candidates] = (bound < self.choice_limits[lengths[candidates]]).any(axis=1)
+        return result
+
+    def _spans(self, n_tokens, sizes):
+        """語数 n_tokens の文書の連続 n 語の (開始位置, 終了位置, n - 1) 配列"""
+        key = (n_tokens, sizes)
+        spans = self.span_cache.get(key)
+        if spans is None:
+            starts = np.concatenate([np.arange(max(n_tokens - n + 1, 0), dtype=np.int64) for n in sizes])
+            gaps = np.concatenate([np.full(max(n_tokens - n + 1, 0), n - 1, dtype=np.int64) for n in sizes])
+            spans = (starts, starts + gaps, gaps)
+            if len(self.span_cache) >= 4096:
+                self.span_cache.clear()
+            self.span_cache[key] = spans
+        return spans
+
+    def plausible_spans(self, tokens, sizes=(2, 3)):
+        """連続 n 語（n in sizes）のうち、いずれかの choice と閾値以上で一致しうるもの → (開始位置, n) の配列
+
+        n-gram は語を半角スペースで連結したもの（語にスペースを含まない前提）
+        """
+        starts, ends, gaps = self._spans(len(tokens), tuple(sizes))
+        if not len(starts) or not self.choices:
+            return starts, gaps + 1
+
+        unique_tokens = dict.fromkeys(tokens)
+        new_tokens = [token for token in unique_tokens if token not in self.token_ids]
+        if new_tokens:
+            if len(self.token_ids) + len(new_tokens) > self.max_tokens:
+                # 保持数の上限を超えるので初期化（既知だった語も消えるので文書の全語を計算し直す）
+                self._reset_tokens()
+                new_tokens = list(unique_tokens)
+            self._add_tokens(new_tokens)
+        token_ids = self.token_ids
+        rows = np.array([token_ids[token] for token in tokens], dtype=np.int64)
+        offsets = np.zeros(len(tokens) + 1, dtype=np.int64)
+        np.cumsum([len(token) for token in tokens], out=offsets[1:])
+        lengths = offsets[ends + 1] - offsets[starts] + gaps
+
+        ok = self._check(rows[starts], rows[ends], lengths)
+        return starts[ok], gaps[ok] + 1
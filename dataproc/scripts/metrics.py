@@ -0,0 +1,178 @@
+"""
+前処理の計測
+- 処理段階ごとの経過時間（wall）・CPU時間・呼び出し回数
+- 件数カウンタ・キャッシュヒット率と合わせて JSON 保存
+- n-gram単位のログ（[WARN]・[REJECT]）は種類ごとに週あたりの件数上限を設けて出力（抑制件数も JSON 保存）
+"""
+
+import json
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+LOG_LIMIT_PER_KIND = 20  # 種類ごとに1週あたり表示するログの上限（超過分は件数のみ記録）
+
+
+class StageTimer:
+    """段階別の wall / CPU 時間を積算"""
+
+    def __init__(self):
+        self.wall = Counter()
+        self.cpu = Counter()
+        self.calls = Counter()
+
+    @contextmanager
+    def stage(self, name):
+        """with timer.stage("tokenize"): ... の区間を計測"""
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield
+        finally:
+            self.wall[name] += time.perf_counter() - wall_start
+            self.cpu[name] += time.process_time() - cpu_start
+            self.calls[name] += 1
+
+    def iterate(self, name, iterable):
+        """イテレータの各要素の取り出し（読み込み・パース）を計測"""
+        iterator = iter(iterable)
+        while True:
+            with self.stage(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def state(self):
+        """現在の積算値（ワーカー → 親プロセスの受け渡し・差分計算用）"""
+        return {'wall': Counter(self.wall), 'cpu': Counter(self.cpu), 'calls': Counter(self.calls)}
+
+    def merge(self, state):
+        """state() の結果を取り込む"""
+        self.wall.update(state['wall'])
+        self.cpu.update(state['cpu'])
+        self.calls.update(state['calls'])
+
+    def drain(self):
+        """積算値を取り出してリセット"""
+        state = self.state()
+        self.wall.clear()
+        self.cpu.clear()
+        self.calls.clear()
+        return state
+
+    def report(self, since=None):
+        """段階別の集計 {段階: {wall_sec, cpu_sec, calls}}（since 以降の差分）"""
+        since = since or {'wall': Counter(), 'cpu': Counter(), 'calls': Counter()}
+        return {
+            name: {
+                'wall_sec': round(self.wall[name] - since['wall'][name], 4),
+                'cpu_sec': round(self.cpu[name] - since['cpu'][name], 4),
+                'calls': self.calls[name] - since['calls'][name],
+            }
+            for name in self.calls
+            if self.calls[name] > since['calls'][name]
+        }
+
+
+class RateLimitedLog:
+    """種類ごとに週の先頭 limit 件だけ表示し、残りは件数のみ記録
+
+    echo=False（--workers のワーカー）では表示せずに溜め、drain() で親プロセスに渡す。
+    親は merge() で自分の上限を当ててから表示するので、上限は全ワーカー合わせての件数になる
+    """
+
+    def __init__(self, limit=LOG_LIMIT_PER_KIND, echo=True):
+        self.limit = limit
+        self.echo = echo
+        self.shown = Counter()
+        self.counts = Counter()
+        self.suppressed = Counter()
+        self.messages = []  # echo=False で溜めた (種類, メッセージ)
+
+    def __call__(self, kind, message):
+        self.counts[kind] += 1
+        if self.echo:
+            self.show(kind, message)
+        elif self.shown[kind] < self.limit:
+            self.shown[kind] += 1
+            self.messages.append((kind, message))
+        else:
+            self.suppressed[kind] += 1
+
+    def show(self, kind, message):
+        """上限内なら表示、超えたら抑制件数に加算"""
+        if self.shown[kind] >= self.limit:
+            self.suppressed[kind] += 1
+            return
+        self.shown[kind] += 1
+        print(message)
+
+    def reset(self):
+        """表示件数の上限をリセット（週の処理の開始時）"""
+        self.shown.clear()
+
+    def state(self):
+        """現在の件数（差分計算用）"""
+        return {'counts': Counter(self.counts), 'suppressed': Counter(self.suppressed)}
+
+    def drain(self):
+        """件数と溜めたメッセージを取り出してリセット（ワーカー → 親プロセスの受け渡し用）"""
+        state = {**self.state(), 'messages': self.messages}
+        self.counts.clear()
+        self.suppressed.clear()
+        self.shown.clear()
+        self.messages = []
+        return state
+
+    def merge(self, state):
+        """drain() の結果を取り込み、溜めたメッセージを上限内で表示"""
+        self.counts.update(state['counts'])
+        self.suppressed.update(state['suppressed'])
+        for kind, message in state['messages']:
+            self.show(kind, message)
+
+    def report(self, since=None):
+        """種類別の件数 {種類: {total, suppressed}}（since 以降の差分）"""
+        since = since or {'counts': Counter(), 'suppressed': Counter()}
+        return {
+            kind: {
+                'total': self.counts[kind] - since['counts'][kind],
+                'suppressed': self.suppressed[kind] - since['suppressed'][kind],
+            }
+            for kind in sorted(self.counts)
+            if self.counts[kind] > since['counts'][kind]
+        }
+
+
+def cache_hit_rates(counters, names):
+    """カウンタから各キャッシュのヒット率を計算"""
+    rates = {}
+    for name in names:
+        hits = counters.get(f'{name}_cache_hits', 0)
+        misses = counters.get(f'{name}_cache_misses', 0)
+        if hits + misses:
+            rates[name] = round(hits / (hits + misses), 4)
+    return rates
+
+
+def write_metrics(path, stages, counters, **extra):
+    """計測結果を JSON 保存
+
+    workers > 1 の場合、各段階の時間は全プロセスの合計なので wall_sec の合計は
+    全体の経過時間を超えることがある
+    """
+    metrics = {
+        'generated_at': datetime.now().isoformat(timespec='seconds'),
+        **extra,
+        'stages': stages,
+        'counters': dict(sorted(counters.items())),
+        'cache_hit_rate': cache_hit_rates(counters, ['fuzzy', 'token']),
+    }
+    path = Path(path)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(metrics, f, ensure_ascii=False, indent=2)
+    return path
@@ -7,15 +7,33 @@
 - 未知語抽出
 """
 
+import argparse
+import hashlib
 import json
+import multiprocessing
 import re
+import shutil
+import sys
+import zlib
 import pandas as pd
-import yaml
 from pathlib import Path
-from datetime import datetime, timedelta
-from collections import defaultdict, Counter
-import fugashi
-from rapidfuzz import fuzz, process
+from datetime import date, datetime, timedelta
+from collections import defaultdict, deque, Counter
+from functools import partial
+from itertools import islice
+from matcher import NgramPruner, clean_text
+from cache import CACHE_DIR, PersistentCache
+from tools_dict import load_compiled_dict
+from topk import SpaceSaving
+from manifest import Manifest
+from processed_schema import build_tools_table, tools_path, write_parquet
+from metrics import RateLimitedLog, StageTimer, write_metrics
+from dedup import NearDuplicateFilter
+from user_dict import create_tagger
+
+# リポジトリ直下の共通モジュールを参照
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from rss_io import is_rss_file, iter_rss_articles, list_rss_files
 
 # 設定
 WEIGHT = {
@@ -28,45 +46,93 @@ WEIGHT = {
 MIN_FUZZY_SCORE = 90  # 90前後で調整
 MIN_WORD_LENGTH = 3   # 最小単語長
 MAX_PENDING_WORDS = 150  # 未知語リスト最大数
+DEDUP_THRESHOLD = 0.8  # 近似重複とみなす類似度（文字5-gramのJaccard、0で無効）
+DEDUP_SOURCES = ("rss",)  # 近似重複をまとめるソース（複数フィード・転載のあるRSSのみ。YouTubeの連作動画等は別の記事として数える）
+PENDING_TRACKER_CAPACITY = 200_000  # 未知語頻度を追跡する最大語数（誤差上限は 総出現数 / この値）
+FUZZY_WORKERS = -1  # Fuzzyスコアリングの並列数（-1で全コア）
+FUZZY_CACHE_MAX_ENTRIES = 500_000  # Fuzzy結果キャッシュの最大件数
+FUZZY_CACHE_VERSION = 1  # キャッシュ形式・スコアラー変更時に上げる
+TOKEN_CACHE_MAX_ENTRIES = 100_000  # 形態素解析キャッシュの最大件数（記事数）
+TOKEN_CACHE_VERSION = 1  # トークン化ルール変更時に上げる
+WORKER_CHUNK_SIZE = 64  # --workers 時に1タスクで渡す文書数
+WORKER_PREFETCH_CHUNKS = 2  # --workers 時にワーカー1つあたり先に送っておくタスク数
+PROCESSED_DIR = Path("dataproc/processed")
+PROCESSING_VERSION = 4  # 出力が変わる処理変更時に上げる（マニフェストの記録を無効化）
+
+# 週次入力ファイル（ソース, ディレクトリ, ファイル名パターン）
+WEEKLY_INPUTS = [
+    ("rss", "rss/weekly", "weekly_summary_*.json"),
+    ("rss", "rss/weekly", "weekly_summary_*.parquet"),  # 同じ日付なら後に並べた Parquet を使う
+    ("aiweekly", "aiweekly/weekly", "aiweekly_*.json"),
+    ("youtube", "youtube/weekly", "youtube_weekly_*.json"),
+]
+DATE_STAMP = re.compile(r'(\d{8})')
+
+# 英数字のみの本文用トークナイザ（MeCab と同じく英字の連続・数字の連続を1語とし、記号は1文字ずつなので候補外）
+ASCII_TOKEN = re.compile(r'[A-Za-z]+|[0-9]+')
 
 # 英語ストップワード（一旦全削除）
 ENGLISH_STOP_WORDS = set()  # 空にする
 
 class DataProcessor:
-    def __init__(self):
-        self.tagger = fugashi.Tagger()
-        self.tools_dict = self.load_tools_dict()
-        self.all_variants = self.build_variants_list()
-        
-    def load_tools_dict(self):
-        """ツール辞書読み込み"""
-        dict_path = Path("dataproc/dict/tools.yml")
-        if not dict_path.exists():
-            return []
-        
-        with open(dict_path, 'r', encoding='utf-8') as f:
-            return yaml.safe_load(f) or []
-    
-    def build_variants_list(self):
-        """全ツール名のvariantsリスト構築"""
-        variants = []
-        for tool in self.tools_dict:
-            # canonical name
-            variants.append(tool['canonical'])
-            
-            # variants
-            if 'variants' in tool:
-                variants.extend(tool['variants'])
-                
-            # versions
-            if 'versions' in tool:
-                variants.extend(tool['versions'])
-                
-            # features
-            if 'features' in tool:
-                variants.extend(tool['features'])
-                
-        return list(set(variants))  # 重複除去
+    def __init__(self, use_cache=True, fuzzy_workers=FUZZY_WORKERS, compiled_dict=None,
+                 dedup_threshold=DEDUP_THRESHOLD):
+        self.load_tools_dict(compiled_dict)
+        # ツール名の日本語表記はユーザー辞書で1語にする（user_dict_hash はキャッシュ・マニフェストの照合用）
+        self.tagger, self.user_dict_hash = create_tagger(self.all_variants)
+        self.fuzzy_workers = fuzzy_workers
+        self.dedup_threshold = dedup_threshold
+        self.stats = Counter()  # 処理統計（Fuzzyスコアリング回数等）
+        self.timer = StageTimer()  # 段階別の処理時間
+        self.log = RateLimitedLog()  # n-gram単位のログ（種類ごとに週あたりの件数上限）
+        self.fuzzy_cache = self.open_fuzzy_cache() if use_cache else None
+        self.token_cache = self.open_token_cache() if use_cache else None
+        
+    def load_tools_dict(self, compiled=None):
+        """コンパイル済みツール辞書読み込み（tools.yml 変更時は自動で再コンパイル、compiled 指定時はそれを使用）"""
+        if compiled is None:
+            compiled = load_compiled_dict()
+        self.dict_hash = compiled.dict_hash
+        self.tools_dict = compiled.tools
+        self.all_variants = compiled.all_variants
+        self.variant_to_canonical = compiled.variant_to_canonical
+        self.tools_by_canonical = compiled.tools_by_canonical
+        self.variant_match_mode = compiled.variant_match_mode
+        self.exact_matcher = compiled.exact_matcher
+        self.fuzzy_matcher = compiled.fuzzy_matcher
+        # 2-gram・3-gram の Fuzzy 候補の枝刈り（語ごとの距離表は処理しながら構築）
+        self.ngram_pruner = NgramPruner(self.fuzzy_matcher.choices, MIN_FUZZY_SCORE)
+    
+    def open_fuzzy_cache(self):
+        """n-gram → (最良variant, スコア) の永続キャッシュ（辞書・閾値が変わると自動破棄）"""
+        fingerprint = f"v{FUZZY_CACHE_VERSION}:{self.dict_hash}:{MIN_FUZZY_SCORE}"
+        return PersistentCache(CACHE_DIR / "fuzzy_matches.sqlite", fingerprint, FUZZY_CACHE_MAX_ENTRIES)
+    
+    def open_token_cache(self):
+        """クレンジング済み本文のハッシュ → フィルタ済みトークン列の永続キャッシュ"""
+        dic = self.tagger.dictionary_info[0]
+        fingerprint = f"v{TOKEN_CACHE_VERSION}:{dic['version']}:{dic['size']}:{self.user_dict_hash}:{MIN_WORD_LENGTH}"
+        return PersistentCache(CACHE_DIR / "tokens.sqlite", fingerprint, TOKEN_CACHE_MAX_ENTRIES)
+    
+    def processing_params(self):
+        """出力に影響する処理パラメータ（マニフェストに記録）"""
+        return {
+            'version': PROCESSING_VERSION,
+            'MIN_FUZZY_SCORE': MIN_FUZZY_SCORE,
+            'MIN_WORD_LENGTH': MIN_WORD_LENGTH,
+            'WEIGHT': WEIGHT,
+            'MAX_PENDING_WORDS': MAX_PENDING_WORDS,
+            'PENDING_TRACKER_CAPACITY': PENDING_TRACKER_CAPACITY,
+            'DEDUP_THRESHOLD': self.dedup_threshold,
+            'DEDUP_SOURCES': list(DEDUP_SOURCES),
+            'mecab_dict': self.tagger.dictionary_info[0]['version'],
+            'mecab_user_dict': self.user_dict_hash,
+        }
+    
+    def caches(self):
+        """有効な永続キャッシュ一覧（名前 → キャッシュ）"""
+        caches = {'fuzzy': self.fuzzy_cache, 'token': self.token_cache}
+        return {name: cache for name, cache in caches.items() if cache is not None}
     
     def is_valid_candidate(self, word):
         """候補語の妥当性チェック（強化版）"""
@@ -101,7 +167,7 @@ class DataProcessor:
         # RSS週次ファイル
         rss_weekly_dir = data_dir / "rss" / "weekly"
         if rss_weekly_dir.exists():
-            rss_files = list(rss_weekly_dir.glob("weekly_summary_*.json"))
+            rss_files = list_rss_files(rss_weekly_dir, "weekly_summary_")
             if rss_files:
                 latest_rss = max(rss_files, key=lambda x: x.stat().st_mtime)
                 latest_files.append(latest_rss)
@@ -127,8 +193,34 @@ class DataProcessor:
         
         return latest_files
     
+    def get_weekly_files_by_week(self, data_dir):
+        """全週次ファイルをファイル名の日付でISO週ごとに対応付け {週の金曜日: [ファイル, ...]}
+        
+        同じ週に同じソースのファイルが複数ある場合は日付の新しい方を使う
+        """
+        weeks = defaultdict(dict)
+        
+        for source, sub_dir, pattern in WEEKLY_INPUTS:
+            for path in sorted((data_dir / sub_dir).glob(pattern)):
+                match = DATE_STAMP.search(path.name)
+                if not match:
+                    continue
+                stamp = datetime.strptime(match.group(1), "%Y%m%d").date()
+                year, week, _ = stamp.isocalendar()
+                # 出力ファイル名は定期実行（金曜）と揃える
+                week_date = date.fromisocalendar(year, week, 5)
+                
+                current = weeks[week_date].get(source)
+                if current is None or stamp >= current[0]:
+                    weeks[week_date][source] = (stamp, path)
+        
+        return {
+            week_date: [path for _, path in by_source.values()]
+            for week_date, by_source in sorted(weeks.items())
+        }
+    
     def extract_content(self, obj, source):
-        """ソース別本文抽出（YouTubeタグ対応版）"""
+        """ソース別本文抽出（1記事・1動画・1ニュースレター項目単位、YouTubeタグ対応版）"""
         try:
             if source == "reddit":
                 title = obj.get('title', '')
@@ -136,46 +228,23 @@ class DataProcessor:
                 return f"{title} {body}".strip()
                 
             elif source == "youtube":
-                # channelsからvideosのtitleとtags抽出
-                content_parts = []
-                if 'channels' in obj:
-                    for channel_name, channel_data in obj['channels'].items():
-                        if 'videos' in channel_data:
-                            for video in channel_data['videos']:
-                                title = video.get('title', '')
-                                tags = video.get('tags', [])
-                                
-                                content_parts.append(title)
-                                # タグも追加（重要なAIツール名が含まれる可能性）
-                                if tags and isinstance(tags, list):
-                                    content_parts.extend(tags)
-                                
+                # 動画のtitleとtags
+                content_parts = [obj.get('title', '')]
+                tags = obj.get('tags', [])
+                # タグも追加（重要なAIツール名が含まれる可能性）
+                if tags and isinstance(tags, list):
+                    content_parts.extend(tags)
                 return ' '.join(content_parts).strip()
                 
             elif source == "rss":
-                # 週次RSS集約の場合
-                if "sites" in obj:
-                    all_content = []
-                    for site_name, articles in obj["sites"].items():
-                        for article in articles:
-                            title = article.get("title", "")
-                            summary = article.get("summary", "")
-                            all_content.append(f"{title} {summary}")
-                    return " ".join(all_content).strip()
-                else:
-                    # 通常のRSS記事
-                    title = obj.get('title', '')
-                    summary = obj.get('summary', '')
-                    return f"{title} {summary}".strip()
+                title = obj.get('title', '')
+                summary = obj.get('summary', '')
+                return f"{title} {summary}".strip()
                 
             elif source == "aiweekly":
-                # articlesの配列から本文抽出
-                if 'articles' in obj and obj['articles']:
-                    article = obj['articles'][0]  # 最初の記事
-                    title = article.get('title', '')
-                    content = article.get('content', '')
-                    return f"{title} {content}".strip()
-                return ""
+                title = obj.get('title', '')
+                content = obj.get('content', '')
+                return f"{title} {content}".strip()
                 
             else:
                 return ""
@@ -184,6 +253,29 @@ class DataProcessor:
             print(f"Content extraction error: {e}")
             return ""
     
+    def iter_documents(self, obj, source):
+        """JSONオブジェクトを記事・動画・ニュースレター項目ごとの文書に分解"""
+        if source == "youtube":
+            # channels → videos
+            for channel_name, channel_data in obj.get('channels', {}).items():
+                for video in channel_data.get('videos', []):
+                    yield {'source': source, 'site': channel_name, 'content': self.extract_content(video, source)}
+                    
+        elif source == "rss" and "sites" in obj:
+            # 週次RSS集約: sites → articles
+            for site_name, articles in obj["sites"].items():
+                for article in articles:
+                    yield {'source': source, 'site': site_name, 'content': self.extract_content(article, source)}
+                    
+        elif source == "aiweekly":
+            for article in obj.get('articles') or []:
+                yield {'source': source, 'site': obj.get('source', ''), 'content': self.extract_content(article, source)}
+                
+        else:
+            # 単体のRSS記事・Reddit投稿
+            site = obj.get('subreddit') or obj.get('site', '')
+            yield {'source': source, 'site': site, 'content': self.extract_content(obj, source)}
+    
     def detect_source(self, obj):
         """JSONオブジェクトからソース判定"""
         if "subreddit" in obj:
@@ -201,42 +293,55 @@ class DataProcessor:
     
     def clean_text(self, text):
         """テキストクレンジング（改良版）"""
-        # HTMLタグ除去
-        text = re.sub(r'<[^>]+>', '', text)
-        
-        # URL除去
-        text = re.sub(r'https?://\S+', '', text)
-        
-        # 重要：ハイフンとドットは保持（GPT-4、Claude-3、v6.1等のため）
-        # 英数字、ハイフン、ドット、スペース以外を除去
-        text = re.sub(r'[^\w\s\-\.]', ' ', text)
-        
-        # 連続空白を単一に
-        text = re.sub(r'\s+', ' ', text)
-        
-        return text.strip()
+        return clean_text(text)
     
-    def extract_ngrams(self, text, n=3):
-        """形態素解析 + n-gram抽出（改良版）"""
-        ngrams = []
+    def tokenize(self, text):
+        """形態素解析 + 候補トークンのフィルタ（ASCIIのみの本文は正規表現で分割）"""
+        if text.isascii():
+            self.stats['token_fast_path'] += 1
+            return [word for word in ASCII_TOKEN.findall(text) if len(word) >= MIN_WORD_LENGTH]
         
-        # 形態素解析
         words = []
         for word in self.tagger(text):
             surface = word.surface
-            features = str(word.feature).split(',')
-            pos = features[0]
+            # 短い語は品詞を見る前に除外（素性の取得が解析より重いため）
+            if len(surface) < MIN_WORD_LENGTH:
+                continue
             
             # 改良されたフィルタ：英数字を含む語、または名詞・記号・未知語
             if (any(c.isalnum() for c in surface) or 
-                pos in ['名詞', '記号', '未知語']):
-                if len(surface) >= MIN_WORD_LENGTH:
-                    words.append(surface)
+                word.feature.pos1 in ['名詞', '記号', '未知語']):
+                words.append(surface)
+        
+        return words
+    
+    def tokenize_cached(self, text):
+        """tokenize の結果を本文ハッシュで永続キャッシュ（重複記事・週をまたぐ再処理で再解析しない）"""
+        # ASCIIのみの本文はキャッシュを引くより分割し直す方が速い
+        if self.token_cache is None or text.isascii():
+            return self.tokenize(text)
+        
+        key = hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest()
+        cached = self.token_cache.get_many([key])
+        if key in cached:
+            self.stats['token_cache_hits'] += 1
+            packed = zlib.decompress(cached[key]).decode('utf-8')
+            return packed.split('\x1f') if packed else []
+        
+        self.stats['token_cache_misses'] += 1
+        words = self.tokenize(text)
+        # トークンは単位区切り文字で連結してzlib圧縮
+        self.token_cache.put_many([(key, zlib.compress('\x1f'.join(words).encode('utf-8')))])
+        return words
+    
+    def build_ngrams(self, words, unigrams=None):
+        """トークン列から1〜3-gram生成（妥当性チェック付き、unigrams は妥当性チェック済みの1-gram）"""
+        ngrams = []
         
         # 1-gram（妥当性チェック付き）
-        for word in words:
-            if self.is_valid_candidate(word):
-                ngrams.append(word)
+        if unigrams is None:
+            unigrams = [word for word in words if self.is_valid_candidate(word)]
+        ngrams.extend(unigrams)
         
         # 2-gram
         for i in range(len(words) - 1):
@@ -252,120 +357,264 @@ class DataProcessor:
         
         return ngrams
     
-    def match_tools(self, ngrams):
-        """n-gramをツール辞書とマッチング（ツール別厳格度対応版）"""
-        matched_tools = defaultdict(int)
-        ngram_counts = Counter(ngrams)  # 頻度をカウント
+    def build_candidate_ngrams(self, words, unigrams=None):
+        """ツール照合用のn-gram（2-gram・3-gramは辞書の表記と閾値以上で一致しうるものだけ）
+        
+        未知語抽出は build_ngrams の全n-gramを使う（枝刈りしたn-gramはどの表記とも一致しない）
+        """
+        if unigrams is None:
+            unigrams = [word for word in words if self.is_valid_candidate(word)]
+        ngrams = list(unigrams)
+        starts, sizes = self.ngram_pruner.plausible_spans(words)
+        for start, n in zip(starts.tolist(), sizes.tolist()):
+            ngram = " ".join(words[start:start + n])
+            if self.is_valid_candidate(ngram):
+                ngrams.append(ngram)
+        return ngrams
+    
+    def extract_ngrams(self, text, n=3):
+        """形態素解析 + n-gram抽出（改良版、トークン列はキャッシュ）"""
+        return self.build_ngrams(self.tokenize_cached(text))
+    
+    def extract_candidate_ngrams(self, text):
+        """形態素解析 + ツール照合用のn-gram抽出"""
+        return self.build_candidate_ngrams(self.tokenize_cached(text))
+    
+    def count_exact_matches(self, cleaned):
+        """クレンジング済みテキストを1パス走査して完全一致回数を集計"""
+        # 短すぎる表記（pi、SD等）はn-gram側と同じく対象外
+        return self.exact_matcher.count(cleaned, min_length=MIN_WORD_LENGTH)
+    
+    def fuzzy_match_ngrams(self, ngram_counts, all_ngrams=None):
+        """重複除去済みn-gramを1回だけFuzzyスコアリング（match_tools・未知語抽出で共有）
+        
+        all_ngrams は枝刈り前の全n-gram（fuzzy_calls_saved の旧フローの呼び出し回数の計算用、省略時は ngram_counts）
+        """
+        queries = [ngram for ngram in ngram_counts if ngram not in self.variant_to_canonical]
+        matches = {}
+        
+        # 永続キャッシュ（値は "variant\tscore"、閾値未満は空文字）
+        cached = self.fuzzy_cache.get_many(queries) if self.fuzzy_cache is not None else {}
+        for ngram, value in cached.items():
+            if value:
+                variant, score = value.rsplit('\t', 1)
+                matches[ngram] = (variant, float(score))
+        
+        queries_to_score = [ngram for ngram in queries if ngram not in cached]
+        self.stats['fuzzy_cache_hits'] += len(cached)
+        self.stats['fuzzy_cache_misses'] += len(queries_to_score) if self.fuzzy_cache is not None else 0
+        
+        scored = self.fuzzy_matcher.best_matches(queries_to_score, MIN_FUZZY_SCORE, workers=self.fuzzy_workers)
+        matches.update(scored)
+        
+        if self.fuzzy_cache is not None:
+            self.fuzzy_cache.put_many(
+                (ngram, f"{scored[ngram][0]}\t{scored[ngram][1]!r}" if ngram in scored else "")
+                for ngram in queries_to_score
+            )
+        
+        # 旧フロー: 枝刈りなしの全n-gramを match_toolsで異なりn-gramごと + 未知語抽出で出現ごとにスコアリング
+        legacy_counts = ngram_counts if all_ngrams is None else Counter(all_ngrams)
+        legacy_calls = sum(1 for ngram in legacy_counts if ngram not in self.variant_to_canonical)
+        legacy_calls += sum(legacy_counts.values())
+        self.stats['fuzzy_scored'] += len(queries_to_score)
+        self.stats['fuzzy_calls_saved'] += legacy_calls - len(queries_to_score)
+        
+        return matches
+    
+    def match_tools(self, ngrams, exact_counts=None, fuzzy_matches=None):
+        """n-gramをツール辞書とマッチング（ツール別厳格度対応版）
+        
+        exact_counts を渡した場合、完全一致はその集計を使い、
+        n-gram側はFuzzyマッチング（表記ゆれ）のみを担当する
+        fuzzy_matches を渡した場合はスコアリング済みの結果を再利用する
+        """
+        typed_matches = self.match_tools_by_type(Counter(ngrams), exact_counts, fuzzy_matches)
+        return self.merge_match_types(typed_matches)
+    
+    def match_tools_by_type(self, ngram_counts, exact_counts=None, fuzzy_matches=None):
+        """match_tools の一致種別ごとの内訳 {(canonical, "exact"/"fuzzy"): スコア寄与}"""
+        typed_matches = defaultdict(int)
+        
+        if exact_counts is not None:
+            exact_counts = self.merge_exact_counts(exact_counts, ngram_counts)
+            for variant, count in exact_counts.items():
+                canonical = self.find_canonical(variant)
+                if canonical:
+                    typed_matches[(canonical, 'exact')] += count * 2  # 完全一致はボーナス
+        
+        # 完全一致しなかったn-gramだけを候補絞り込み付きで一括スコアリング
+        if fuzzy_matches is None:
+            fuzzy_matches = self.fuzzy_match_ngrams(ngram_counts)
         
         for ngram, count in ngram_counts.items():
             # 完全一致を優先
-            if ngram in self.all_variants:
+            if ngram in self.variant_to_canonical:
+                if exact_counts is not None:
+                    continue  # オートマトン側で集計済み
                 canonical = self.find_canonical(ngram)
                 if canonical:
-                    matched_tools[canonical] += count * 2  # 完全一致はボーナス
+                    typed_matches[(canonical, 'exact')] += count * 2  # 完全一致はボーナス
                     continue
             
             # Fuzzy マッチング（閾値を厳格化）
-            matches = process.extract(
-                ngram, 
-                self.all_variants, 
-                scorer=fuzz.ratio,
-                limit=1
-            )
+            match = fuzzy_matches.get(ngram)
             
-            if matches and matches[0][1] >= MIN_FUZZY_SCORE:
+            if match:
                 # マッチしたvariantから canonical name を逆引き
-                matched_variant = matches[0][0]
+                matched_variant, score = match
                 canonical = self.find_canonical(matched_variant)
                 if canonical:
                     # ツール別厳格度チェック
-                    tool_info = self.get_tool_info(canonical)
-                    if tool_info.get('match_mode') == 'exact_only':
+                    if self.variant_match_mode.get(matched_variant) == 'exact_only':
                         # 完全一致のみ許可
                         if ngram != matched_variant:
-                            print(f"  [REJECT] Exact match required: '{ngram}' -> '{matched_variant}' (rejected)")
+                            self.log('reject', f"  [REJECT] Exact match required: '{ngram}' -> '{matched_variant}' (rejected)")
                             continue
                     
                     # 低信頼度マッチングを警告
-                    if matches[0][1] < 95:
-                        print(f"  [WARN] Low confidence: '{ngram}' -> '{matched_variant}' ({matches[0][1]:.1f})")
+                    if score < 95:
+                        self.log('warn', f"  [WARN] Low confidence: '{ngram}' -> '{matched_variant}' ({score:.1f})")
                     
-                    matched_tools[canonical] += count
+                    typed_matches[(canonical, 'fuzzy')] += count
         
+        return dict(typed_matches)
+    
+    def merge_exact_counts(self, exact_counts, ngram_counts):
+        """オートマトンの完全一致回数を n-gram の完全一致回数で補う（variant ごとに多い方）
+        
+        オートマトンは最左最長・重なりなしなので、長い表記に含まれる表記（GitHub Copilot の Copilot）や、
+        除外した語・記号をまたいで n-gram で隣り合う表記（Google's Gemini → google gemini）を数えない。
+        n-gram 照合だけの頃と同じ回数になるように、こうした一致は n-gram 側の回数を使う
+        """
+        merged = Counter(exact_counts)
+        for ngram, count in ngram_counts.items():
+            if ngram in self.variant_to_canonical and count > merged[ngram]:
+                merged[ngram] = count
+        return merged
+    
+    def merge_match_types(self, typed_matches):
+        """一致種別の内訳を canonical ごとに合算（matched_tools 列の形式）"""
+        matched_tools = defaultdict(int)
+        for (canonical, _), count in typed_matches.items():
+            matched_tools[canonical] += count
         return dict(matched_tools)
     
     def find_canonical(self, variant):
         """variantからcanonical nameを逆引き"""
-        for tool in self.tools_dict:
-            if variant == tool['canonical']:
-                return tool['canonical']
-            
-            if 'variants' in tool and variant in tool['variants']:
-                return tool['canonical']
-                
-            if 'versions' in tool and variant in tool['versions']:
-                return tool['canonical']
-                
-            if 'features' in tool and variant in tool['features']:
-                return tool['canonical']
-        
-        return None
+        return self.variant_to_canonical.get(variant)
     
     def get_tool_info(self, canonical):
         """canonical nameからツール情報を取得"""
-        for tool in self.tools_dict:
-            if tool['canonical'] == canonical:
-                return tool
-        return {}
+        return self.tools_by_canonical.get(canonical, {})
     
-    def extract_unknown_words(self, ngrams):
+    def extract_unknown_words(self, ngrams, fuzzy_matches=None):
         """未知語抽出（ツール辞書にないもの）"""
         unknown = []
         
-        for ngram in ngrams:
-            # 妥当性チェック
-            if not self.is_valid_candidate(ngram):
-                continue
-            
-            # 既知ツールとのマッチング確認
-            matches = process.extract(
-                ngram,
-                self.all_variants,
-                scorer=fuzz.ratio,
-                limit=1
-            )
-            
-            # マッチしない、または低スコアの場合は未知語候補
-            if not matches or matches[0][1] < MIN_FUZZY_SCORE:
+        # 妥当性チェック
+        candidates = [ngram for ngram in ngrams if self.is_valid_candidate(ngram)]
+        
+        # 既知ツールとのマッチング確認（閾値以上の一致のみ返る）
+        if fuzzy_matches is None:
+            fuzzy_matches = self.fuzzy_match_ngrams(Counter(candidates))
+        
+        for ngram in candidates:
+            # 完全一致せず、Fuzzyでも閾値未満の場合は未知語候補
+            # （照合前に枝刈りした2-gram・3-gramも閾値未満が確定しているので、ここでは全n-gramが対象）
+            if ngram not in self.variant_to_canonical and ngram not in fuzzy_matches:
                 unknown.append(ngram)
         
         return unknown
     
-    def process_files(self, debug=False):
-        """メイン処理（デバッグ出力制御可能）"""
-        data_dir = Path("data")
-        processed_dir = Path("dataproc/processed")
-        processed_dir.mkdir(exist_ok=True)
-        
-        # 日付ベースでファイル処理
-        today = datetime.now().strftime("%Y-%m-%d")
-        
-        all_records = []
-        all_pending = []
-        
-        # 最新週次ファイルのみ取得
-        latest_files = self.get_latest_weekly_files(data_dir)
-        
-        if not latest_files:
-            print("No weekly files found!")
-            return
-        
-        for json_file in latest_files:
+    def process_document(self, doc, debug=False):
+        """1文書の処理（レコード・一致種別の内訳・未知語リストを返す、n-gramなしはNone）"""
+        content = doc['content']
+        source = doc['source']
+        
+        # 本文なし
+        if not content:
+            return None
+        
+        self.stats['documents'] += 1
+        
+        # テキストクレンジング
+        with self.timer.stage('clean_text'):
+            cleaned = self.clean_text(content)
+        
+        # 形態素解析（キャッシュ付き） → n-gram抽出
+        with self.timer.stage('tokenize'):
+            words = self.tokenize_cached(cleaned)
+        with self.timer.stage('ngram'):
+            unigrams = [word for word in words if self.is_valid_candidate(word)]
+            ngrams = self.build_ngrams(words, unigrams)  # 未知語抽出用
+            candidates = self.build_candidate_ngrams(words, unigrams)  # ツール照合用
+        self.stats['tokens'] += len(words)
+        self.stats['ngrams'] += len(ngrams)
+        self.stats['candidate_ngrams'] += len(candidates)
+        if not ngrams:
+            return None
+        
+        if debug:
+            print(f"  Extracted {len(ngrams)} n-grams from {source}/{doc['site']}")
+            print(f"  Sample n-grams: {ngrams[:10]}")
+        
+        # ツールマッチング（完全一致はオートマトンで1パス）
+        with self.timer.stage('exact_match'):
+            exact_counts = self.count_exact_matches(cleaned)
+        
+        # Fuzzyスコアリングは異なりn-gramごとに1回だけ（辞書と一致しえない2-gram・3-gramは除外済み）
+        with self.timer.stage('fuzzy_match'):
+            ngram_counts = Counter(candidates)
+            fuzzy_matches = self.fuzzy_match_ngrams(ngram_counts, all_ngrams=ngrams)
+            typed_matches = self.match_tools_by_type(ngram_counts, exact_counts, fuzzy_matches)
+            matched = self.merge_match_types(typed_matches)
+        self.stats['distinct_ngrams'] += len(ngram_counts)
+        
+        if debug and matched:
+            print(f"  Matched tools: {matched}")
+        
+        # 未知語抽出
+        with self.timer.stage('unknown_words'):
+            unknown = self.extract_unknown_words(ngrams, fuzzy_matches)
+        
+        # レコード作成
+        record = {
+            'source': source,
+            'site': doc['site'],
+            'weight': WEIGHT.get(source, 1.0),
+            'content': content[:500],  # 500文字まで保存
+            'matched_tools': matched,
+            'file_path': doc.get('file_path', ''),
+            'cluster_id': doc.get('cluster_id'),  # 近似重複のクラスタ（保存前に duplicates へ置換）
+        }
+        
+        return record, typed_matches, unknown
+    
+    def try_process_document(self, doc, debug=False):
+        """process_document のエラーを握りつぶす版（1記事の失敗で全体を止めない）"""
+        try:
+            return self.process_document(doc, debug=debug)
+        except Exception as e:
+            print(f"Document processing error: {e}")
+            return None
+    
+    def iter_input_documents(self, json_files, debug=False):
+        """入力ファイル群から文書を順に生成"""
+        for json_file in json_files:
                 
             print(f"Processing: {json_file}")
             
             try:
-                with open(json_file, 'r', encoding='utf-8') as f:
+                # RSSはファイル全体を読み込まず、パースしながらサイト単位で処理
+                if is_rss_file(json_file):
+                    for site_name, article in self.timer.iterate('load', iter_rss_articles(json_file)):
+                        with self.timer.stage('extract_content'):
+                            content = self.extract_content(article, "rss")
+                        yield {'source': "rss", 'site': site_name, 'content': content, 'file_path': str(json_file)}
+                    continue
+                
+                with self.timer.stage('load'), open(json_file, 'r', encoding='utf-8') as f:
                     data = json.load(f)
                 
                 # リスト形式とオブジェクト形式の両方に対応
@@ -382,81 +631,323 @@ class DataProcessor:
                         if debug:
                             print(f"  Source detected: {source} for keys: {list(obj.keys())[:5]}")
                         
-                        # 本文抽出
-                        content = self.extract_content(obj, source)
-                        if not content:
-                            continue
-                        
-                        # テキストクレンジング
-                        cleaned = self.clean_text(content)
-                        
-                        # n-gram抽出
-                        ngrams = self.extract_ngrams(cleaned)
-                        if not ngrams:
-                            continue
-                        
-                        if debug:
-                            print(f"  Extracted {len(ngrams)} n-grams from {source}")
-                            print(f"  Sample n-grams: {ngrams[:10]}")
-                        
-                        # ツールマッチング
-                        matched = self.match_tools(ngrams)
-                        
-                        if debug and matched:
-                            print(f"  Matched tools: {matched}")
-                        elif debug:
-                            print(f"  No tools matched")
-                        
-                        # 未知語抽出
-                        unknown = self.extract_unknown_words(ngrams)
-                        
-                        # レコード作成
-                        record = {
-                            'source': source,
-                            'weight': WEIGHT.get(source, 1.0),
-                            'content': content[:500],  # 500文字まで保存
-                            'matched_tools': matched,
-                            'file_path': str(json_file)
-                        }
-                        all_records.append(record)
-                        
-                        # 未知語リストに追加
-                        all_pending.extend(unknown)
-                        
                     except Exception as e:
                         print(f"Object processing error: {e}")
                         continue
+                    
+                    for doc in self.timer.iterate('extract_content', self.iter_documents(obj, source)):
+                        doc['file_path'] = str(json_file)
+                        yield doc
                         
             except Exception as e:
                 print(f"File processing error {json_file}: {e}")
                 continue
+    
+    def iter_results(self, docs, workers=1, debug=False):
+        """文書ごとの処理結果を入力順に返す（workers > 1 でプロセス並列）"""
+        if workers <= 1:
+            for doc in docs:
+                yield self.try_process_document(doc, debug=debug)
+            return
+        
+        # ワーカーごとにTagger・辞書を構築、結果は入力順のまま受け取る
+        # 入力の読み込みはこのスレッドで行う（imap に渡すと Pool の送信スレッドで読まれ、
+        # 読み込み側の計測・統計の更新がワーカー結果の取り込みと競合する）
+        context = multiprocessing.get_context("spawn")
+        with context.Pool(workers, initializer=_init_worker, initargs=(self.dedup_threshold, False)) as pool:
+            caches = self.caches()
+            in_flight = deque()
+            chunks = iter(lambda: list(islice(docs, WORKER_CHUNK_SIZE)), [])
+            while True:
+                # 先読みは一定数まで（入力全体をメモリに載せない）
+                while len(in_flight) < workers * WORKER_PREFETCH_CHUNKS:
+                    chunk = next(chunks, None)
+                    if chunk is None:
+                        break
+                    in_flight.append(pool.apply_async(_process_chunk, (chunk,), {'debug': debug}))
+                if not in_flight:
+                    return
+                
+                results, stats, timings, logs, cache_updates = in_flight.popleft().get()
+                self.stats.update(stats)
+                self.timer.merge(timings)
+                self.log.merge(logs)
+                for name, updates in cache_updates.items():
+                    if name in caches:
+                        caches[name].merge(*updates)
+                yield from results
+    
+    def process_files(self, debug=False, workers=1, force=False):
+        """メイン処理（最新週のみ、デバッグ出力制御可能、workers > 1 で並列処理）"""
+        data_dir = Path("data")
+        
+        # 最新週次ファイルのみ取得
+        latest_files = self.get_latest_weekly_files(data_dir)
+        
+        if not latest_files:
+            print("No weekly files found!")
+            return
+        
+        # 日付ベースでファイル処理
+        today = datetime.now().strftime("%Y-%m-%d")
+        
+        # 入力・辞書・パラメータが前回と同じなら再処理しない
+        manifest = Manifest()
+        fingerprint = manifest.fingerprint(latest_files, self.dict_hash, self.processing_params())
+        if not force:
+            if manifest.is_current(today, fingerprint):
+                print(f"Skipped {today}: inputs unchanged since last run")
+                return
+            same = manifest.find_same(fingerprint)
+            if same:
+                # 新しい入力がない週は前回の出力をそのまま今日付で複製
+                outputs = self.copy_outputs(*same, today)
+                manifest.record(today, fingerprint, outputs)
+                manifest.save()
+                return
+        
+        outputs = self.process_week(latest_files, today, debug=debug, workers=workers)
+        manifest.record(today, fingerprint, outputs)
+        manifest.save()
+        self.report_stats()
+    
+    def copy_outputs(self, source_date, entry, output_date):
+        """同じ入力から作成済みの出力ファイルを別日付で複製"""
+        outputs = []
+        for source_path in map(Path, entry['outputs']):
+            output_path = source_path.with_name(source_path.name.replace(source_date, output_date, 1))
+            shutil.copyfile(source_path, output_path)
+            outputs.append(output_path)
+            print(f"Copied unchanged output: {source_path} -> {output_path}")
+        return outputs
+    
+    def backfill(self, start_date, end_date, debug=False, workers=1, force=False):
+        """過去週の再処理（週の金曜日が期間内の週を対象、workers > 1 で週単位の並列処理）"""
+        weeks = {
+            week_date: files
+            for week_date, files in self.get_weekly_files_by_week(Path("data")).items()
+            if start_date <= week_date <= end_date
+        }
+        
+        if not weeks:
+            print(f"No weekly files found between {start_date} and {end_date}")
+            return
+        
+        # 入力・辞書・パラメータが記録と同じ週は対象外
+        manifest = Manifest()
+        params = self.processing_params()
+        tasks = []
+        fingerprints = {}
+        for week_date, files in weeks.items():
+            output_date = week_date.strftime("%Y-%m-%d")
+            fingerprints[output_date] = manifest.fingerprint(files, self.dict_hash, params)
+            if force or not manifest.is_current(output_date, fingerprints[output_date]):
+                tasks.append((output_date, files))
+        
+        print(f"Backfilling {len(tasks)} of {len(weeks)} weeks: {min(weeks)} - {max(weeks)} "
+              f"({len(weeks) - len(tasks)} unchanged)")
+        if not tasks:
+            return
+        
+        if workers <= 1:
+            for output_date, files in tasks:
+                outputs = self.process_week(files, output_date, debug=debug)
+                manifest.record(output_date, fingerprints[output_date], outputs)
+                manifest.save()
+                self.flush_caches()
+        else:
+            # 1ワーカー = 1週、キャッシュ・マニフェストの書き込みは親プロセスでまとめて行う
+            context = multiprocessing.get_context("spawn")
+            caches = self.caches()
+            with context.Pool(min(workers, len(tasks)), initializer=_init_worker,
+                              initargs=(self.dedup_threshold,)) as pool:
+                for output_date, outputs, stats, timings, logs, cache_updates in pool.imap_unordered(
+                        partial(_process_week, debug=debug), tasks):
+                    manifest.record(output_date, fingerprints[output_date], outputs)
+                    manifest.save()
+                    self.stats.update(stats)
+                    self.timer.merge(timings)
+                    self.log.merge(logs)
+                    for name, updates in cache_updates.items():
+                        if name in caches:
+                            caches[name].merge(*updates)
+                    self.flush_caches()
+        
+        self.report_stats()
+    
+    def report_stats(self):
+        """Fuzzy・キャッシュ統計の表示とキャッシュ書き込み"""
+        print(f"Fuzzy scoring: {self.stats['fuzzy_scored']} n-grams scored, "
+              f"{self.stats['fuzzy_calls_saved']} scorer calls saved")
+        print(f"Tokenize: {self.stats['token_fast_path']} of {self.stats['documents']} documents without MeCab")
+        print(f"N-grams: {self.stats['candidate_ngrams']} of {self.stats['ngrams']} sent to tool matching")
+        
+        for kind, counts in self.log.report().items():
+            if counts['suppressed']:
+                print(f"[{kind.upper()}] {counts['suppressed']} of {counts['total']} messages suppressed")
+        
+        self.flush_caches()
+        for name in self.caches():
+            hits = self.stats[f'{name}_cache_hits']
+            misses = self.stats[f'{name}_cache_misses']
+            hit_rate = hits / (hits + misses) if hits + misses else 0.0
+            print(f"{name.capitalize()} cache: {hits} hits, {misses} misses ({hit_rate:.1%})")
+    
+    def flush_caches(self):
+        """キャッシュの未書き込み分を書き込み（週ごとに呼び、全週分をメモリに溜めない）"""
+        for cache in self.caches().values():
+            cache.flush()
+    
+    def process_week(self, input_files, output_date, debug=False, workers=1, processed_dir=PROCESSED_DIR):
+        """1週分の入力ファイルを処理して {output_date}.parquet・_tools.parquet・_pending.parquet を保存（保存したパスを返す）"""
+        processed_dir = Path(processed_dir)
+        processed_dir.mkdir(exist_ok=True)
+        
+        # 計測は週単位（開始時点からの差分を metrics に保存）
+        wall_start = datetime.now()
+        stats_start = Counter(self.stats)
+        timer_start = self.timer.state()
+        log_start = self.log.state()
+        self.log.reset()
+        
+        outputs = []
+        all_records = []
+        tool_rows = []  # 縦持ちテーブルの行
+        pending_tracker = SpaceSaving(PENDING_TRACKER_CAPACITY)  # 未知語頻度（メモリ一定）
+        
+        # 記事単位でクレンジング → 形態素解析 → マッチング
+        docs = self.iter_input_documents(input_files, debug=debug)
+        
+        # 近似重複（HNの複数フィード・転載記事等）はクラスタの代表だけ処理
+        dedup = NearDuplicateFilter(self.dedup_threshold) if self.dedup_threshold else None
+        if dedup is not None:
+            docs = dedup.filter(docs, select=lambda doc: doc['source'] in DEDUP_SOURCES,
+                                stage=partial(self.timer.stage, 'dedup'))
+        
+        cluster_ids = []
+        for result in self.iter_results(docs, workers=workers, debug=debug):
+            if result is None:
+                continue
+            
+            record, typed_matches, unknown = result
+            cluster_id = record.pop('cluster_id')
+            
+            # ランキングに寄与する（ツールが検出された）記事のみ保存
+            if record['matched_tools']:
+                record_id = len(all_records)
+                all_records.append({'record_id': record_id, **record})
+                cluster_ids.append(cluster_id)
+                for (tool, match_type), count in typed_matches.items():
+                    tool_rows.append((record_id, record['source'], tool, count, match_type, record['weight']))
+            
+            # 未知語頻度を更新
+            pending_tracker.update(Counter(unknown))
+        
+        # クラスタにまとめた重複記事数（全件読み終えてから確定）
+        if dedup is not None:
+            for record, cluster_id in zip(all_records, cluster_ids):
+                record['duplicates'] = dedup.duplicates(cluster_id)
+            self.stats['duplicates_collapsed'] += dedup.total_duplicates()
+            print(f"Near-duplicates collapsed: {dedup.total_duplicates()} "
+                  f"(threshold {self.dedup_threshold}, {len(dedup.cluster_sizes)} clusters)")
         
         # データフレーム作成・保存
         if all_records:
-            df = pd.DataFrame(all_records)
-            output_path = processed_dir / f"{today}.parquet"
-            df.to_parquet(output_path, index=False)
+            with self.timer.stage('write'):
+                df = pd.DataFrame(all_records)
+                output_path = processed_dir / f"{output_date}.parquet"
+                write_parquet(df, output_path)
+                
+                # 集計用の縦持ちテーブル（record_id で本体と対応）
+                tools_df = build_tools_table(tool_rows)
+                tools_output_path = tools_path(output_path)
+                write_parquet(tools_df, tools_output_path)
+            outputs.extend([output_path, tools_output_path])
             print(f"Saved: {output_path} ({len(df)} records)")
+            print(f"Saved tools: {tools_output_path} ({len(tools_df)} rows)")
+        
+        self.stats['records'] += len(all_records)
         
         # 未知語リスト作成・保存
-        if all_pending:
-            # 頻度集計
-            pending_counts = Counter(all_pending)
-            
-            # 頻度上位を選択
-            top_pending = pending_counts.most_common(MAX_PENDING_WORDS)
+        if pending_tracker.total:
+            # 頻度上位を選択（frequency は真の頻度以上、真の頻度 >= frequency - error）
+            top_pending = pending_tracker.most_common(MAX_PENDING_WORDS)
             
-            pending_df = pd.DataFrame(top_pending, columns=['word', 'frequency'])
-            pending_path = processed_dir / f"{today}_pending.parquet"
-            pending_df.to_parquet(pending_path, index=False)
-            print(f"Saved pending: {pending_path} ({len(pending_df)} words)")
+            pending_df = pd.DataFrame(top_pending, columns=['word', 'frequency', 'error'])
+            pending_path = processed_dir / f"{output_date}_pending.parquet"
+            with self.timer.stage('write'):
+                pending_df.to_parquet(pending_path, index=False)
+            outputs.append(pending_path)
+            print(f"Saved pending: {pending_path} ({len(pending_df)} words, "
+                  f"{pending_tracker.total} occurrences, error bound {pending_tracker.error_bound():.1f})")
+        
+        # 段階別の処理時間・件数（マニフェストの出力には含めない）
+        metrics_path = write_metrics(
+            processed_dir / f"{output_date}_metrics.json",
+            self.timer.report(since=timer_start),
+            self.stats - stats_start,
+            output_date=output_date,
+            logs=self.log.report(since=log_start),
+            inputs=[str(path) for path in input_files],
+            workers=workers,
+            wall_sec=round((datetime.now() - wall_start).total_seconds(), 4),
+        )
+        print(f"Saved metrics: {metrics_path}")
+        
+        return outputs
+
+# ワーカープロセス用（プロセスごとに1回だけ初期化）
+_worker = None
+
+def _init_worker(dedup_threshold=DEDUP_THRESHOLD, echo_log=True):
+    """ワーカー初期化: Tagger・辞書・マッチャーをプロセスごとに構築（echo_log=False でログは親プロセスが表示）"""
+    global _worker
+    _worker = DataProcessor(fuzzy_workers=1, dedup_threshold=dedup_threshold)
+    _worker.log.echo = echo_log
+
+def _process_chunk(docs, debug=False):
+    """ワーカー側の処理: 結果・統計・ログ・キャッシュ更新分を親プロセスに返す"""
+    results = [_worker.try_process_document(doc, debug=debug) for doc in docs]
+    
+    stats = Counter(_worker.stats)
+    _worker.stats.clear()
+    cache_updates = {name: cache.drain() for name, cache in _worker.caches().items()}
+    
+    return results, stats, _worker.timer.drain(), _worker.log.drain(), cache_updates
+
+def _process_week(task, debug=False):
+    """ワーカー側の週単位処理: 統計・ログ件数・キャッシュ更新分を親プロセスに返す"""
+    output_date, input_files = task
+    outputs = _worker.process_week(input_files, output_date, debug=debug)
+    
+    stats = Counter(_worker.stats)
+    _worker.stats.clear()
+    cache_updates = {name: cache.drain() for name, cache in _worker.caches().items()}
+    
+    return output_date, outputs, stats, _worker.timer.drain(), _worker.log.drain(), cache_updates
+
+def parse_date(value):
+    """YYYY-MM-DD 形式の日付引数"""
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid date (expected YYYY-MM-DD): {value}")
 
 if __name__ == "__main__":
-    processor = DataProcessor()
+    parser = argparse.ArgumentParser(description='Preprocess weekly raw data')
+    parser.add_argument('--debug', action='store_true', help='Print per-document debug output')
+    parser.add_argument('--workers', type=int, default=1, help='Number of worker processes (default: 1)')
+    parser.add_argument('--backfill', nargs=2, type=parse_date, metavar=('START', 'END'),
+                        help='Reprocess every week whose Friday falls in START..END (YYYY-MM-DD), one parquet per week')
+    parser.add_argument('--force', action='store_true', help='Reprocess even if the manifest says inputs are unchanged')
+    parser.add_argument('--dedup-threshold', type=float, default=DEDUP_THRESHOLD,
+                        help=f'Near-duplicate similarity threshold, 0 disables (default: {DEDUP_THRESHOLD})')
     
-    # デバッグモードで実行する場合
-    import sys
-    debug_mode = len(sys.argv) > 1 and sys.argv[1] == "--debug"
+    args = parser.parse_args()
     
-    processor.process_files(debug=debug_mode)
+    processor = DataProcessor(dedup_threshold=args.dedup_threshold)
+    if args.backfill:
+        processor.backfill(*args.backfill, debug=args.debug, workers=args.workers, force=args.force)
+    else:
+        processor.process_files(debug=args.debug, workers=args.workers, force=args.force)
     print("Preprocessing completed!")
\ No newline at end of file
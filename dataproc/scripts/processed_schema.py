@@ -0,0 +1,53 @@
+"""
+processed/*.parquet のスキーマ
+- {date}.parquet: 記事単位のレコード（matched_tools は canonical → 件数 の dict 列）
+  v3〜 duplicates: 近似重複としてまとめた記事数（代表の記事だけを処理・保存）
+- {date}_tools.parquet: matched_tools を縦持ちにしたテーブル（v2〜）
+  record_id, source, tool, count, match_type（exact/fuzzy）, weight
+  count は matched_tools と同じくスコア寄与分（完全一致は2倍済み）なので、
+  tool ごとの count * weight の合計がそのまま今週スコアになる
+- スキーマバージョンは parquet のメタデータに記録（記録なしは v1 = dict 列のみ）
+"""
+
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+SCHEMA_VERSION = 3
+SCHEMA_VERSION_KEY = b"dataproc.schema_version"
+TOOLS_SUFFIX = "_tools"
+TOOLS_COLUMNS = ['record_id', 'source', 'tool', 'count', 'match_type', 'weight']
+CATEGORY_COLUMNS = ['source', 'tool', 'match_type']  # 辞書エンコードする文字列列
+
+
+def write_parquet(df, path):
+    """スキーマバージョン付きで保存"""
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    metadata = dict(table.schema.metadata or {})
+    metadata[SCHEMA_VERSION_KEY] = str(SCHEMA_VERSION).encode()
+    pq.write_table(table.replace_schema_metadata(metadata), path)
+
+
+def read_schema_version(path):
+    """保存時のスキーマバージョン（記録なしは1）"""
+    metadata = pq.read_schema(path).metadata or {}
+    return int(metadata.get(SCHEMA_VERSION_KEY, b"1"))
+
+
+def tools_path(path):
+    """{date}.parquet に対応する縦持ちテーブルのパス"""
+    path = Path(path)
+    return path.with_name(f"{path.stem}{TOOLS_SUFFIX}{path.suffix}")
+
+
+def build_tools_table(rows):
+    """(record_id, source, tool, count, match_type, weight) の行から縦持ちテーブル作成"""
+    df = pd.DataFrame(rows, columns=TOOLS_COLUMNS)
+    df['record_id'] = df['record_id'].astype('int32')
+    df['count'] = df['count'].astype('int32')
+    df['weight'] = df['weight'].astype('float64')
+    for column in CATEGORY_COLUMNS:
+        df[column] = df[column].astype('category')
+    return df
@@ -13,9 +13,13 @@ from pathlib import Path
 from datetime import datetime, timedelta
 from collections import defaultdict
 import argparse
+import re
+from tools_dict import DICT_PATH, load_compiled_dict
+from processed_schema import read_schema_version, tools_path
 
 # 設定
 DECAY_FACTOR = 0.3  # 前週スコア減衰係数
+PROCESSED_FILE = re.compile(r'^\d{4}-\d{2}-\d{2}\.parquet$')  # 記事レコード本体（_pending・_tools 等は除外）
 
 def get_current_week():
     """現在の週番号取得 (ISO週番号)"""
@@ -47,39 +51,35 @@ def load_genres():
         return yaml.safe_load(f) or []
 
 def load_tools_dict():
-    """ツール辞書読み込み（aggregate: true のみ）"""
-    dict_path = Path("dataproc/dict/tools.yml")
-    
-    if not dict_path.exists():
-        print(f"Warning: {dict_path} not found.")
+    """ツール辞書読み込み（aggregate: true のみ、コンパイル済み辞書を使用）"""
+    if not DICT_PATH.exists():
+        print(f"Warning: {DICT_PATH} not found.")
         return {}
     
-    with open(dict_path, 'r', encoding='utf-8') as f:
-        tools_list = yaml.safe_load(f) or []
-    
-    # canonical name -> genre のマッピング作成（aggregate: true のみ）
-    tools_map = {}
-    for tool in tools_list:
-        if tool.get('aggregate', True):  # デフォルトはTrue
-            tools_map[tool['canonical']] = tool['genre']
-    
-    return tools_map
+    # canonical name -> genre のマッピング（aggregate: true のみ）
+    return load_compiled_dict().genre_map
 
 def load_current_week_data():
     """今週のprocessedデータ読み込み"""
     processed_dir = Path("dataproc/processed")
     
-    # 最新のprocessedファイル検索（pending以外）
-    parquet_files = [f for f in processed_dir.glob("*.parquet") if "pending" not in f.name]
+    # 最新のprocessedファイル検索（日付.parquet のみ）
+    parquet_files = [f for f in processed_dir.glob("*.parquet") if PROCESSED_FILE.match(f.name)]
     
     if not parquet_files:
         print("No processed data files found")
         return pd.DataFrame()
     
-    # 最新ファイル使用
-    latest_file = max(parquet_files, key=lambda x: x.stat().st_mtime)
-    print(f"Reading current week data: {latest_file}")
+    # 最新ファイル使用（ファイル名の日付で判定、バックフィルで過去週を書き直しても影響しない）
+    latest_file = max(parquet_files, key=lambda x: x.name)
     
+    # v2以降は縦持ちテーブルから集計に必要な列だけ読む
+    tools_file = tools_path(latest_file)
+    if read_schema_version(latest_file) >= 2 and tools_file.exists():
+        print(f"Reading current week data: {tools_file}")
+        return pd.read_parquet(tools_file, columns=['tool', 'count', 'weight'])
+    
+    print(f"Reading current week data: {latest_file}")
     return pd.read_parquet(latest_file)
 
 def load_previous_week_scores(previous_week):
@@ -96,6 +96,13 @@ def load_previous_week_scores(previous_week):
 
 def calculate_current_scores(df, tools_map):
     """今週のスコア計算"""
+    if 'tool' in df.columns:
+        # 縦持ちテーブル（v2〜）: ベクトル化集計（ツールは初出順）
+        df = df[df['tool'].isin(list(tools_map))]  # aggregate対象のツールのみ
+        scores = (df['count'] * df['weight']).groupby(df['tool'].astype(str), sort=False).sum()
+        return {tool: float(score) for tool, score in scores.items()}
+    
+    # 旧形式（matched_tools の dict 列）
     current_scores = defaultdict(float)
     
     for _, row in df.iterrows():
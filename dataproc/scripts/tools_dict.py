@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+ツール辞書のコンパイル
+- dataproc/dict/tools.yml を解析済みの形（逆引きインデックス・ジャンル・集計フラグ・
+  match_mode・完全一致オートマトン・Fuzzy用インデックス）にまとめて pickle 保存
+- 読み込み時に tools.yml のハッシュと形式バージョンを照合し、違えば自動で再コンパイル
+- 各スクリプトは load_compiled_dict() を呼ぶだけでよい（YAML解析・インデックス構築を省略）
+"""
+
+import argparse
+import hashlib
+import pickle
+import time
+from pathlib import Path
+
+import yaml
+from matcher import ExactMatcher, FuzzyMatcher, clean_text
+from cache import CACHE_DIR
+
+DICT_PATH = Path("dataproc/dict/tools.yml")
+ARTIFACT_PATH = CACHE_DIR / "tools_dict.pkl"
+ARTIFACT_VERSION = 1  # 格納内容・マッチャーの構造を変えたら上げる
+
+
+class CompiledDict:
+    """コンパイル済みツール辞書（属性は build_state() の各項目）"""
+
+    def __init__(self, state):
+        self.__dict__.update(state)
+
+
+def iter_names(tool):
+    """canonical・variants・versions・features を順に列挙"""
+    yield tool['canonical']
+    yield from tool.get('variants') or []
+    yield from tool.get('versions') or []
+    yield from tool.get('features') or []
+
+
+def build_variants_list(tools):
+    """全ツール名のvariantsリスト構築"""
+    variants = set()
+    for tool in tools:
+        variants.update(iter_names(tool))
+    return sorted(variants)  # 重複除去（順序を固定）
+
+
+def build_index(tools):
+    """逆引きインデックス構築（variant→canonical、canonical→ツール情報、variant→match_mode、canonical→ジャンル）"""
+    variant_to_canonical = {}
+    tools_by_canonical = {}
+    variant_match_mode = {}
+    genre_map = {}  # aggregate: true のツールのみ
+
+    for tool in tools:
+        canonical = tool['canonical']
+        # 同名canonicalが複数ある場合は先勝ち（従来の線形探索と同じ）
+        tools_by_canonical.setdefault(canonical, tool)
+
+        if tool.get('aggregate', True):  # デフォルトはTrue
+            genre_map[canonical] = tool['genre']
+
+        for name in iter_names(tool):
+            if name not in variant_to_canonical:
+                variant_to_canonical[name] = canonical
+                variant_match_mode[name] = tool.get('match_mode')
+
+    return {
+        'variant_to_canonical': variant_to_canonical,
+        'tools_by_canonical': tools_by_canonical,
+        'variant_match_mode': variant_match_mode,
+        'genre_map': genre_map,
+    }
+
+
+def build_exact_matcher(all_variants):
+    """完全一致用オートマトン構築（clean_text後の表記で登録）"""
+    patterns = {}
+    for variant in all_variants:
+        key = clean_text(variant)
+        # 表記が衝突した場合は元表記と一致するものを優先
+        if key not in patterns or key == variant:
+            patterns[key] = variant
+    return ExactMatcher(patterns)
+
+
+def build_state(tools, dict_hash):
+    """コンパイル済み辞書の中身を構築"""
+    all_variants = build_variants_list(tools)
+    state = {
+        'version': ARTIFACT_VERSION,
+        'dict_hash': dict_hash,
+        'tools': tools,
+        'all_variants': all_variants,
+        'exact_matcher': build_exact_matcher(all_variants),
+        'fuzzy_matcher': FuzzyMatcher(all_variants),
+    }
+    state.update(build_index(tools))
+    return state
+
+
+def hash_dict_file(dict_path=DICT_PATH):
+    """tools.yml のハッシュ（ファイルがなければ空文字）"""
+    if not dict_path.exists():
+        return ""
+    return hashlib.sha256(dict_path.read_bytes()).hexdigest()
+
+
+def compile_dict(dict_path=DICT_PATH, artifact_path=ARTIFACT_PATH):
+    """tools.yml を解析してコンパイル済み辞書を保存"""
+    if dict_path.exists():
+        raw = dict_path.read_bytes()
+        dict_hash = hashlib.sha256(raw).hexdigest()
+        tools = yaml.safe_load(raw.decode('utf-8')) or []
+    else:
+        dict_hash = ""
+        tools = []
+
+    state = build_state(tools, dict_hash)
+
+    artifact_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = artifact_path.with_suffix(".tmp")
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+    tmp_path.replace(artifact_path)  # 並列実行中の読み込みで壊れたファイルを読まないように
+
+    return CompiledDict(state)
+
+
+def load_compiled_dict(dict_path=DICT_PATH, artifact_path=ARTIFACT_PATH):
+    """コンパイル済み辞書を読み込み（tools.yml が変わっていれば再コンパイル）"""
+    dict_hash = hash_dict_file(dict_path)
+
+    if artifact_path.exists():
+        try:
+            with open(artifact_path, 'rb') as f:
+                state = pickle.load(f)
+            if state.get('version') == ARTIFACT_VERSION and state.get('dict_hash') == dict_hash:
+                return CompiledDict(state)
+        except Exception as e:
+            print(f"Warning: failed to load {artifact_path}: {e}")
+
+    print(f"Compiling tool dictionary: {dict_path} -> {artifact_path}")
+    return compile_dict(dict_path, artifact_path)
+
+
+def main():
+    """tools.yml を強制的に再コンパイル"""
+    parser = argparse.ArgumentParser(description="ツール辞書のコンパイル")
+    parser.add_argument('--dict', type=Path, default=DICT_PATH, help='ツール辞書YAML')
+    parser.add_argument('--output', type=Path, default=ARTIFACT_PATH, help='出力先')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    compiled = compile_dict(args.dict, args.output)
+    compile_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    load_compiled_dict(args.dict, args.output)
+    load_time = time.perf_counter() - start
+
+    print(f"Tools: {len(compiled.tools)}, variants: {len(compiled.all_variants)}")
+    print(f"Saved: {args.output} ({args.output.stat().st_size / 1024:.1f} KB)")
+    print(f"Compile: {compile_time * 1000:.0f} ms, load: {load_time * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
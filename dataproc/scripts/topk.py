@@ -0,0 +1,73 @@
+"""
+頻出語の近似上位K件（Space-Saving）
+- 監視する語数を capacity に固定し、入力がいくら増えてもメモリは一定
+- 誤差の上限
+  - 報告頻度 frequency は真の頻度以上、かつ frequency - error 以上が保証される
+  - error <= 総出現数 N / capacity（入れ替えが起きなければ error = 0 で厳密）
+  - 真の頻度が N / capacity を超える語は必ず監視中（取りこぼさない）
+"""
+
+import heapq
+from operator import itemgetter
+
+
+class SpaceSaving:
+    """Space-Saving による重み付きストリームの頻度上位推定"""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.counts = {}  # 語 → 推定頻度（挿入順を保持: 同数時の並びを Counter と揃える）
+        self.errors = {}  # 語 → 過大評価の上限
+        self.heap = []    # (推定頻度の下限, 語)、最小頻度の語を探すための遅延更新ヒープ
+        self.total = 0
+        self.evictions = 0
+
+    def add(self, item, count=1):
+        """item を count 回観測"""
+        self.total += count
+
+        if item in self.counts:
+            # ヒープは更新しない（入れ替え時にまとめて直す）
+            self.counts[item] += count
+            return
+
+        if len(self.counts) < self.capacity:
+            self.counts[item] = count
+            self.errors[item] = 0
+            heapq.heappush(self.heap, (count, item))
+            return
+
+        # 最小頻度の語を追い出し、その頻度を誤差として引き継ぐ
+        min_count, min_item = self._pop_min()
+        del self.counts[min_item]
+        del self.errors[min_item]
+        self.evictions += 1
+
+        self.counts[item] = min_count + count
+        self.errors[item] = min_count
+        heapq.heappush(self.heap, (min_count + count, item))
+
+    def update(self, counts):
+        """{語: 回数} をまとめて観測"""
+        for item, count in counts.items():
+            self.add(item, count)
+
+    def _pop_min(self):
+        """推定頻度が最小の監視語を取り出す（古いヒープ要素は現在値で積み直す）"""
+        while True:
+            count, item = heapq.heappop(self.heap)
+            current = self.counts[item]
+            if count == current:
+                return count, item
+            heapq.heappush(self.heap, (current, item))
+
+    def error_bound(self):
+        """全報告頻度に共通する誤差上限 N / capacity"""
+        if not self.evictions:
+            return 0
+        return self.total / self.capacity
+
+    def most_common(self, n):
+        """推定頻度の上位 n 件 [(語, 頻度, 誤差)]"""
+        top = heapq.nlargest(n, self.counts.items(), key=itemgetter(1))
+        return [(item, count, self.errors[item]) for item, count in top]
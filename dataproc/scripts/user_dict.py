@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+MeCab ユーザー辞書の生成（dataproc/dict/tools.yml の表記から）
+- 日本語を含む表記（チャットGPT、ミッドジャーニー等）を1語として解析させ、断片の n-gram を作らない
+- 目的は分割だけ（ツール名の検出は従来どおり完全一致・n-gram 照合で行うので、品詞は 名詞,固有名詞,一般）
+- 英数字のみの表記は対象外（ASCIIのみの本文は MeCab を通さず分割するので、登録すると本文によって分割が変わる）
+- 空白を含む表記は MeCab の1語にできないので対象外（従来どおり n-gram 側で照合）
+- システム辞書だけで1語になる表記（クロード等）は対象外（品詞・連接が変わり、前後の分割まで変わるため）
+- 登録語以外の分割が変わらないことを segmentation_changes で確認（python user_dict.py で直近の週次データを検査）
+- 生成物は登録語・システム辞書から決まるハッシュ付きのファイル名で保存し、変わったときだけ作り直す
+"""
+
+import argparse
+import glob
+import hashlib
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import fugashi
+from matcher import clean_text
+from cache import CACHE_DIR
+from tools_dict import load_compiled_dict
+
+USER_DICT_VERSION = 3  # 登録内容（品詞・コスト）を変えたら上げる
+USER_DICT_PREFIX = "tools_user_"
+CONTEXT_FEATURE = "名詞,固有名詞,一般,*,*,*,*,*,*"  # 登録語の品詞（left-id.def / right-id.def の表記）
+TOOL_POS = ("名詞", "固有名詞", "一般", "*")
+# 0 だと登録語を含む長い語まで分割する（ジェミニーズ → ジェミニ/ー/ズ）。
+# 3000〜5000 で登録語はすべて1語・それ以外の分割は不変、6000 以上は「コードラマ」等が断片に分かれる
+WORD_COST = 4000
+FEATURE_FIELDS = 26  # unidic の素性数（dicrc 参照）
+CHECK_FILES = "data/*/weekly/*.json"  # 分割の変化を確認する入力
+CHECK_LATEST = 8  # 確認に使う直近ファイル数
+
+
+def surfaces(tagger, text):
+    """表層形の列"""
+    return [word.surface for word in tagger(text)]
+
+
+def user_dict_words(all_variants, system_tagger):
+    """ユーザー辞書に登録する表記（clean_text 後の本文と同じ形、システム辞書で既に1語のものは除く）"""
+    words = set()
+    for variant in all_variants:
+        word = clean_text(variant)
+        if word and not word.isascii() and not any(c.isspace() for c in word):
+            words.add(word)
+    return sorted(word for word in words if surfaces(system_tagger, word) != [word])
+
+
+def token_spans(tagger, text):
+    """(開始位置, 終了位置, 表層形) の列"""
+    spans = []
+    position = 0
+    for surface in surfaces(tagger, text):
+        start = text.find(surface, position)
+        position = start + len(surface)
+        spans.append((start, position, surface))
+    return spans
+
+
+def segmentation_changes(system_tagger, user_tagger, text, words):
+    """ユーザー辞書で変わった分割のうち、登録語を1語にする以外の変化（該当箇所の前後の文字列のリスト）
+
+    許すのは、登録語の両端に境界ができることと、登録語の内部の境界が消えることだけ
+    """
+    before = token_spans(system_tagger, text)
+    after = token_spans(user_tagger, text)
+    if [surface for _, _, surface in before] == [surface for _, _, surface in after]:
+        return []
+
+    old_bounds = {bound for start, end, _ in before for bound in (start, end)}
+    new_bounds = {bound for start, end, _ in after for bound in (start, end)}
+    word_edges = {bound for start, end, surface in after if surface in words for bound in (start, end)}
+    changed = new_bounds - old_bounds - word_edges
+    # 登録語でない語が元の境界をまたいでいる（別の位置で結合された）
+    for start, end, surface in after:
+        if surface not in words and any(start < bound < end for bound in old_bounds):
+            changed.add(start)
+    return [text[max(position - 10, 0):position + 10] for position in sorted(changed)]
+
+
+def system_dicdir(tagger):
+    """Tagger が使っているシステム辞書のディレクトリ"""
+    return Path(tagger.dictionary_info[0]['filename']).parent
+
+
+def context_id(def_path, feature=CONTEXT_FEATURE):
+    """left-id.def / right-id.def から品詞の文脈IDを取得"""
+    with open(def_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            context, _, name = line.rstrip('\n').partition(' ')
+            if name == feature:
+                return int(context)
+    raise ValueError(f"Context id for '{feature}' not found in {def_path}")
+
+
+def dict_digest(words, dicdir):
+    """登録語・システム辞書・形式バージョンから決まるハッシュ（ファイル名とトークンキャッシュの照合に使用）"""
+    sys_size = (dicdir / "sys.dic").stat().st_size
+    digest = hashlib.sha256(f"v{USER_DICT_VERSION}:{dicdir}:{sys_size}:{WORD_COST}\n".encode('utf-8'))
+    digest.update("\n".join(words).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def build_rows(words, left_id, right_id):
+    """mecab-dict-index 用の CSV 行（表層形,左文脈ID,右文脈ID,コスト,素性...）"""
+    rows = []
+    for word in words:
+        # 語彙素・書字形は表層形のまま、読みは不明
+        feature = list(TOOL_POS) + ["*", "*", word, word, word, "*", word, "*", "固"]
+        feature += ["*"] * (FEATURE_FIELDS - len(feature))
+        # clean_text 後の表記は「,」「"」を含まないので CSV のエスケープは不要
+        rows.append(",".join([word, str(left_id), str(right_id), str(WORD_COST)] + feature))
+    return rows
+
+
+def build_user_dict(words, dicdir, output_path):
+    """ユーザー辞書をコンパイル
+
+    mecab-dict-index はエラー時にプロセスごと終了し、進捗も標準出力に出すので別プロセスで実行する
+    """
+    left_id = context_id(dicdir / "left-id.def")
+    right_id = context_id(dicdir / "right-id.def")
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        csv_path = Path(tmp_dir) / "tools.csv"
+        csv_path.write_text("\n".join(build_rows(words, left_id, right_id)) + "\n", encoding='utf-8')
+        tmp_output = Path(tmp_dir) / output_path.name
+        args = f'mecab-dict-index -d "{dicdir}" -u "{tmp_output}" -f utf-8 -t utf-8 "{csv_path}"'
+        result = subprocess.run(
+            [sys.executable, "-c", "import sys, fugashi; fugashi.build_dictionary(sys.argv[1])", args],
+            capture_output=True, text=True,
+        )
+        if result.returncode != 0 or not tmp_output.exists():
+            raise RuntimeError(f"mecab-dict-index failed: {result.stderr.strip() or result.stdout.strip()}")
+        # 並列実行中の読み込みで壊れたファイルを読まないように
+        tmp_output.replace(output_path)
+
+    # 古い登録内容の辞書を削除
+    for stale in output_path.parent.glob(f"{USER_DICT_PREFIX}*.dic"):
+        if stale != output_path:
+            stale.unlink(missing_ok=True)
+    return output_path
+
+
+def load_user_dict(all_variants, system_tagger, cache_dir=CACHE_DIR):
+    """ユーザー辞書のパスとハッシュ（登録語なし・生成失敗時は (None, "")、必要なら生成）"""
+    words = user_dict_words(all_variants, system_tagger)
+    if not words:
+        return None, ""
+
+    dicdir = system_dicdir(system_tagger)
+    digest = dict_digest(words, dicdir)
+    path = Path(cache_dir) / f"{USER_DICT_PREFIX}{digest[:16]}.dic"
+    if not path.exists():
+        print(f"Building MeCab user dictionary: {len(words)} words -> {path}")
+        try:
+            build_user_dict(words, dicdir, path)
+        except (OSError, ValueError, RuntimeError) as e:
+            print(f"Warning: failed to build MeCab user dictionary, using system dictionary only: {e}")
+            return None, ""
+    return path, digest
+
+
+def create_tagger(all_variants):
+    """ツール名のユーザー辞書付き Tagger → (Tagger, ユーザー辞書のハッシュ)"""
+    tagger = fugashi.Tagger()
+    path, digest = load_user_dict(all_variants, tagger)
+    if path is None:
+        return tagger, ""
+    return fugashi.Tagger(f'-u "{path}"'), digest
+
+
+def check_texts(pattern=CHECK_FILES, latest=CHECK_LATEST):
+    """分割の確認に使う直近の週次データの行（日本語を含むもの、clean_text 後）"""
+    paths = sorted(glob.glob(pattern), key=lambda path: Path(path).name)[-latest:]
+    texts = []
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            texts.extend(clean_text(line) for line in f if not line.isascii())
+    return texts
+
+
+def main():
+    """tools.yml からユーザー辞書を強制的に再生成し、登録語の解析結果と登録語以外の分割の変化を表示"""
+    parser = argparse.ArgumentParser(description="MeCab ユーザー辞書の生成")
+    parser.add_argument('--output-dir', type=Path, default=CACHE_DIR, help='出力先ディレクトリ')
+    args = parser.parse_args()
+
+    compiled = load_compiled_dict()
+    system_tagger = fugashi.Tagger()
+    words = user_dict_words(compiled.all_variants, system_tagger)
+    dicdir = system_dicdir(system_tagger)
+    if not words:
+        print("No words to register (tools.yml has no Japanese variants split by the system dictionary)")
+        return
+
+    path = args.output_dir / f"{USER_DICT_PREFIX}{dict_digest(words, dicdir)[:16]}.dic"
+    start = time.perf_counter()
+    build_user_dict(words, dicdir, path)
+    build_time = time.perf_counter() - start
+
+    tagger = fugashi.Tagger(f'-u "{path}"')
+    split = [word for word in words if surfaces(tagger, word) != [word]]
+    texts = check_texts()
+    changes = [change for text in texts for change in segmentation_changes(system_tagger, tagger, text, set(words))]
+
+    print(f"Words: {len(words)} of {len(compiled.all_variants)} variants (Japanese, without spaces, split by system dictionary)")
+    print(f"Saved: {path} ({path.stat().st_size / 1024:.1f} KB)")
+    print(f"Build: {build_time * 1000:.0f} ms")
+    print(f"Segmentation check: {len(texts)} lines, {len(changes)} changes outside registered words")
+    if split:
+        print(f"Warning: not tokenized as one word: {split}")
+    if changes:
+        print(f"Warning: segmentation changed outside registered words: {changes[:10]}")
+
+
+if __name__ == "__main__":
+    main()
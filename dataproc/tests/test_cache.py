@@ -0,0 +1,45 @@
+"""
+cache.PersistentCache のテスト
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "scripts"))
+from cache import PersistentCache
+
+
+def test_memory_is_bounded_by_max_entries(tmp_path):
+    """メモリ上の写しは max_entries 件まで（最も古く使った分から捨てる）"""
+    cache = PersistentCache(tmp_path / "cache.sqlite", "fp", max_entries=3)
+    cache.put_many([("a", b"1"), ("b", b"2"), ("c", b"3")])
+    cache.get_many(["a"])  # a を最新に
+    cache.put_many([("d", b"4")])
+    assert list(cache.memory) == ["c", "a", "d"]
+
+
+def test_flush_clears_pending_and_keeps_values(tmp_path):
+    """flush 後は未書き込み分を持たず、メモリから捨てた分も SQLite から読める"""
+    path = tmp_path / "cache.sqlite"
+    cache = PersistentCache(path, "fp", max_entries=2)
+    cache.put_many([("a", b"1"), ("b", b"2")])
+    cache.flush()
+    assert not cache.pending
+    cache.put_many([("c", b"3")])
+    cache.flush()
+    assert "a" not in cache.memory
+    cache.close()
+
+    reopened = PersistentCache(path, "fp", max_entries=2)
+    assert reopened.get_many(["b", "c"]) == {"b": b"2", "c": b"3"}
+    reopened.close()
+
+
+def test_flush_evicts_oldest_written_first(tmp_path):
+    """最終利用時刻が同じ分は先に書き込んだ方から削除する"""
+    cache = PersistentCache(tmp_path / "cache.sqlite", "fp", max_entries=2)
+    cache.put_many([("a", b"1"), ("b", b"2"), ("c", b"3")])
+    cache.flush()
+    keys = [key for key, in cache.conn.execute("SELECT key FROM entries ORDER BY key")]
+    assert keys == ["b", "c"]
+    cache.close()
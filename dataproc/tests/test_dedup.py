@@ -0,0 +1,43 @@
+"""
+dedup.NearDuplicateFilter のテスト
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "scripts"))
+from dedup import NearDuplicateFilter
+
+TEXT = "OpenAI releases a new model for coding agents with better tool use and longer context"
+
+
+def test_filter_only_selected_docs():
+    """select が偽の文書は同じ本文でもまとめず、入力順のまま通す"""
+    docs = [
+        {'source': 'rss', 'content': TEXT},
+        {'source': 'youtube', 'content': TEXT},
+        {'source': 'rss', 'content': TEXT + "!"},
+        {'source': 'youtube', 'content': TEXT},
+    ]
+    dedup = NearDuplicateFilter(0.8)
+    kept = list(dedup.filter(docs, select=lambda doc: doc['source'] == 'rss'))
+    assert [doc['source'] for doc in kept] == ['rss', 'youtube', 'youtube']
+    assert dedup.total_duplicates() == 1
+    assert 'cluster_id' not in kept[1]
+
+
+def test_stage_wraps_only_filtering():
+    """stage は署名計算・割り当ての区間だけで呼ばれる"""
+    calls = []
+
+    class Stage:
+        def __enter__(self):
+            calls.append('enter')
+
+        def __exit__(self, *exc):
+            calls.append('exit')
+
+    docs = [{'content': TEXT}, {'content': "something completely different here"}]
+    kept = list(NearDuplicateFilter(0.8).filter(iter(docs), stage=Stage))
+    assert len(kept) == 2
+    assert calls == ['enter', 'exit']
@@ -0,0 +1,108 @@
+"""
+matcher.NgramPruner のテスト
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "scripts"))
+from matcher import ExactMatcher, NgramPruner, is_boundary
+
+CHOICES = ["stable diffusion", "github copilot", "google gemini", "claude code", "meta llama 3"]
+DOCUMENTS = [
+    "try stable diffusion and github copilot today".split(),
+    "google gemini beats claude code in meta llama 3 tests".split(),
+    "new stable diffusion release with github copilot support".split(),
+    "claude code and google gemini and meta llama 3".split(),
+]
+
+
+def spans(pruner, tokens):
+    starts, sizes = pruner.plausible_spans(tokens)
+    return list(zip(starts.tolist(), sizes.tolist()))
+
+
+def test_plausible_spans_survive_token_reset():
+    """語の保持数が上限を超えて初期化されても、上限なしと同じ結果を返す"""
+    reference = NgramPruner(CHOICES, 80)
+    pruner = NgramPruner(CHOICES, 80, max_tokens=10)
+
+    for tokens in DOCUMENTS * 2:
+        before = len(pruner.token_ids)
+        result = spans(pruner, tokens)
+        assert result == spans(reference, tokens)
+        assert result  # どの文書にも choice に近い 2-/3-gram がある
+        assert len(pruner.token_ids) <= max(10, len(set(tokens)))
+        if before + len(set(tokens)) > 10:
+            assert set(pruner.token_ids) == set(tokens)
+
+
+def test_plausible_spans_keep_matching_ngrams():
+    """choice と一致する n-gram は枝刈りされない"""
+    pruner = NgramPruner(CHOICES, 80)
+    tokens = "we use stable diffusion daily".split()
+    starts, sizes = pruner.plausible_spans(tokens)
+    assert (2, 2) in set(zip(starts.tolist(), sizes.tolist()))
+    assert isinstance(starts, np.ndarray)
+
+
+def test_plausible_spans_independent_of_order():
+    """語の P・S の下限は一緒に計算した語によらない（文書の処理順・ワーカー分割で結果が変わらない）"""
+    choices = CHOICES + ["anthropic claude code command line interface"]  # 切り詰めの影響が出る長い choice
+    long_first = NgramPruner(choices, 80)
+    long_first.plausible_spans(["supercalifragilisticexpialidocious"] + DOCUMENTS[0])  # 長い語と一緒に計算
+    fresh = NgramPruner(choices, 80)
+    fresh.plausible_spans(DOCUMENTS[0])
+    for tokens in DOCUMENTS:
+        assert spans(long_first, tokens) == spans(fresh, tokens)
+    rows = [long_first.token_ids[token] for token in DOCUMENTS[0]]
+    fresh_rows = [fresh.token_ids[token] for token in DOCUMENTS[0]]
+    assert (long_first.prefix_dist[rows] == fresh.prefix_dist[fresh_rows]).all()
+    assert (long_first.suffix_dist[rows] == fresh.suffix_dist[fresh_rows]).all()
+
+
+def test_is_boundary_by_char_class():
+    """字種が変わる位置・空白・記号・文字列の端は境界、同じ字種の間と小数の途中は境界でない"""
+    assert is_boundary("GPT4", 3)  # 英字 → 数字
+    assert is_boundary("チャット生成", 4)  # カタカナ → 漢字
+    assert is_boundary("Claude Code", 6)  # 空白
+    assert is_boundary("abc", 0) and is_boundary("abc", 3)
+    assert not is_boundary("Gemini", 3)
+    assert not is_boundary("4.8", 1)  # 小数点の前
+    assert not is_boundary("4.8", 2)  # 小数点の後
+    assert is_boundary("v4.", 2)  # 文末のドットは区切り
+
+
+def test_exact_matcher_boundaries():
+    """語の一部・小数の一部には一致しない"""
+    matcher = ExactMatcher({"Claude Opus 4": "Claude Opus 4", "Cursor": "Cursor", "ジェミニ": "ジェミニ"})
+    assert matcher.count("Claude Opus 4.8 is out") == {}
+    assert matcher.count("Claude Opus 4 is out") == {"Claude Opus 4": 1}
+    assert matcher.count("Cursors and PreCursor") == {}
+    assert matcher.count("ジェミニを使う") == {"ジェミニ": 1}  # カタカナ → ひらがなは境界
+
+
+def test_exact_matcher_leftmost_longest():
+    """同じ位置からは最長の表記、重なる一致は左のものだけ数える"""
+    matcher = ExactMatcher({"GitHub Copilot": "GitHub Copilot", "Copilot": "Copilot", "GitHub": "GitHub"})
+    assert matcher.count("GitHub Copilot and Copilot") == {"GitHub Copilot": 1, "Copilot": 1}
+
+    # 開始位置の異なる重なりは左を優先
+    matcher = ExactMatcher({"Stable Diffusion": "Stable Diffusion", "Diffusion XL": "Diffusion XL"})
+    assert matcher.count("Stable Diffusion XL") == {"Stable Diffusion": 1}
+    assert matcher.count("Stable Diffusion XL", min_length=13) == {"Stable Diffusion": 1}
+    assert matcher.count("Diffusion XL", min_length=13) == {}
+
+
+def test_merge_exact_counts_keeps_ngram_hits():
+    """オートマトンが数えない n-gram の完全一致（長い表記に含まれる表記・記号をまたぐ表記）を補う"""
+    from types import SimpleNamespace
+    from preprocess import DataProcessor
+
+    processor = SimpleNamespace(variant_to_canonical={"copilot": "copilot", "google gemini": "gemini"})
+    merged = DataProcessor.merge_exact_counts(
+        processor, {"GitHub Copilot": 1, "copilot": 1}, {"copilot": 2, "google gemini": 1, "github": 1}
+    )
+    assert merged == {"GitHub Copilot": 1, "copilot": 2, "google gemini": 1}
@@ -0,0 +1,40 @@
+"""
+metrics.RateLimitedLog のテスト
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "scripts"))
+from metrics import RateLimitedLog
+
+
+def test_limit_resets_per_week(capsys):
+    """上限を超えた分は件数のみ記録し、reset 後は再び表示する"""
+    log = RateLimitedLog(limit=2)
+    for i in range(3):
+        log('warn', f"w{i}")
+    start = log.state()
+    log.reset()
+    log('warn', "w3")
+    assert capsys.readouterr().out.split() == ["w0", "w1", "w3"]
+    assert log.report() == {'warn': {'total': 4, 'suppressed': 1}}
+    assert log.report(since=start) == {'warn': {'total': 1, 'suppressed': 0}}
+
+
+def test_worker_messages_limited_in_parent(capsys):
+    """ワーカーは表示せずに溜め、親は全ワーカー合わせて上限件数まで表示する"""
+    drained = []
+    for worker_id in range(2):
+        worker = RateLimitedLog(limit=3, echo=False)
+        for i in range(4):
+            worker('reject', f"r{worker_id}{i}")
+        drained.append(worker.drain())
+        assert not worker.counts and not worker.messages
+    assert capsys.readouterr().out == ""
+
+    parent = RateLimitedLog(limit=3)
+    for state in drained:
+        parent.merge(state)
+    assert capsys.readouterr().out.split() == ["r00", "r01", "r02"]
+    assert parent.report() == {'reject': {'total': 8, 'suppressed': 5}}
@@ -0,0 +1,48 @@
+"""
+rss_dates.PublishedDateParser のテスト
+"""
+
+import sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from rss_dates import PARSERS, PublishedDateParser, parse_email_date, parse_iso
+
+RFC = "Mon, 09 Jun 2025 09:35:00 +0000"
+ISO = "2025-06-09T11:24:23-04:00"
+EST = "Mon, 09 Jun 2025 05:35:00 EST"
+
+
+def test_memo_hit_and_miss():
+    """同じサイトは前回成功した形式から試し、外れたときだけ他の形式を試して記録する"""
+    parser = PublishedDateParser()
+    assert parser.parse(RFC, "a") == datetime(2025, 6, 9, 9, 35, tzinfo=timezone.utc)
+    assert parser.parse(ISO, "b") == datetime(2025, 6, 9, 11, 24, 23, tzinfo=timezone(timedelta(hours=-4)))
+    assert parser.parse(ISO, "b").utcoffset() == timedelta(hours=-4)
+    assert parser.site_parser == {"b": PARSERS.index(parse_iso)}
+    assert dict(parser.stats) == {'memo_hits': 2, 'memo_misses': 1}
+
+
+def test_format_change_within_site():
+    """サイトの形式が途中で変わったら新しい形式を覚え直す"""
+    parser = PublishedDateParser()
+    for _ in range(2):
+        parser.parse(RFC, "a")
+    assert parser.parse(ISO, "a") is not None
+    assert parser.site_parser["a"] == PARSERS.index(parse_iso)
+    parser.parse(ISO, "a")
+    # 元の形式に戻ると、ISO の次に試す形式（標準ライブラリ）で解析してそれを覚える
+    assert parser.parse(RFC, "a") == datetime(2025, 6, 9, 9, 35, tzinfo=timezone.utc)
+    assert parser.site_parser["a"] == PARSERS.index(parse_email_date)
+    assert parser.parse(EST, "a").utcoffset() == timedelta(hours=-5)  # 標準ライブラリでだけ読める表記
+    assert dict(parser.stats) == {'memo_hits': 4, 'memo_misses': 2}
+
+
+def test_naive_and_invalid():
+    """タイムゾーンの表記なしは UTC、解析できない文字列・空文字は None（空文字は数えない）"""
+    parser = PublishedDateParser()
+    assert parser.parse("2025-06-09", "a") == datetime(2025, 6, 9, tzinfo=timezone.utc)
+    assert parser.parse("yesterday", "a") is None
+    assert parser.parse("", "a") is None
+    assert parser.stats['failed'] == 1
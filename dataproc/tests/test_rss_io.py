@@ -0,0 +1,93 @@
+"""
+rss_io（RSSデータの読み書き）・rss_convert のテスト
+"""
+
+import io
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from rss_convert import convert_dir
+from rss_io import CHUNK_SIZE, JsonStream, iter_rss_sites, load_rss, write_rss_file
+
+WEEKLY = {
+    "week_start": "2026-08-17",
+    "sites": {
+        "a": [
+            {"title": "t1", "summary": None, "score": 1},
+            {"title": "t2"},
+            {"title": None, "summary": "s3", "score": None},
+        ],
+    },
+}
+DAILY = {
+    "collection_date": "2026-08-21",
+    "sites": {
+        "b": {"url": "https://example.com", "articles": [{"title": "t", "author": None}], "status": "success"},
+        "c": {"url": "https://example.org", "articles": [], "status": "error"},
+    },
+}
+
+
+def test_parquet_round_trip_keeps_null_and_missing(tmp_path):
+    """値が null の項目と項目がない記事を区別して読み戻す"""
+    for name, data in (("weekly_summary_20260821", WEEKLY), ("rss_20260821", DAILY)):
+        path = write_rss_file(data, tmp_path / f"{name}.parquet")
+        assert load_rss(path) == data
+
+
+def test_convert_dir_skips_mismatched_files(tmp_path):
+    """読み戻しが一致しないファイルは変換せず、他のファイルの変換は続ける"""
+    lossy = {"sites": {"a": [{"media": {"x": 1}}, {"media": {"y": 2}}]}}  # 構造体の列になり欠けたキーが null で埋まる
+    for name, data in (("weekly_summary_20260814", WEEKLY), ("weekly_summary_20260821", lossy),
+                       ("weekly_summary_20260828", WEEKLY)):
+        (tmp_path / f"{name}.json").write_text(json.dumps(data), encoding='utf-8')
+
+    converted, mismatched = convert_dir(tmp_path, "weekly_summary_", "parquet")
+    assert [target.name for _, target in converted] == [
+        "weekly_summary_20260814.parquet", "weekly_summary_20260828.parquet"]
+    assert mismatched == [tmp_path / "weekly_summary_20260821.json"]
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        "weekly_summary_20260814.json", "weekly_summary_20260814.parquet",
+        "weekly_summary_20260821.json",
+        "weekly_summary_20260828.json", "weekly_summary_20260828.parquet",
+    ]
+
+
+def split_at_chunk(value, offset):
+    """value の JSON 表現の offset 文字目が読み込み単位の境界に来る配列 ["padding", value] の文字列"""
+    prefix = '["'
+    padding = "x" * (CHUNK_SIZE - offset - len(prefix) - len('", '))
+    text = f'{prefix}{padding}", {json.dumps(value, ensure_ascii=False)}]'
+    assert text[CHUNK_SIZE - offset:].startswith(json.dumps(value, ensure_ascii=False))
+    return text
+
+
+def test_json_stream_values_across_chunk_boundary():
+    """読み込み単位の境界をまたぐ文字列・数値・オブジェクトも1つの値として読む"""
+    for value, offset in (("日本語のタイトル", 3), (1234567, 3), (12.5, 2), ({"title": "t", "tags": [1, 2]}, 5)):
+        stream = JsonStream(io.StringIO(split_at_chunk(value, offset)))
+        assert list(stream.iter_array())[1] == value
+
+    # 数値がちょうど境界で終わる（続きを読まないと桁が欠ける）
+    stream = JsonStream(io.StringIO(split_at_chunk(123, 3)))
+    assert list(stream.iter_array())[1] == 123
+
+
+def test_json_stream_empty_containers(tmp_path):
+    """空のオブジェクト・配列（記事のないサイト・サイトのないファイル）"""
+    stream = JsonStream(io.StringIO('{"a": {}, "b": [], "c": [{}, []]}'))
+    values = {key: stream.value() for key in stream.iter_object()}
+    assert values == {"a": {}, "b": [], "c": [{}, []]}
+    assert list(JsonStream(io.StringIO(" [ ] ")).iter_array()) == []
+    assert list(JsonStream(io.StringIO("{ }")).iter_object()) == []
+
+    path = tmp_path / "rss_20260821.json"
+    path.write_text(json.dumps({"collection_date": "2026-08-21", "sites": {
+        "empty": {"url": "u", "articles": []}, "weekly": []}}), encoding='utf-8')
+    header = {}
+    assert list(iter_rss_sites(path, header)) == [("empty", {"url": "u"}, []), ("weekly", {}, [])]
+    assert header == {"collection_date": "2026-08-21"}
+    path.write_text('{"sites": {}}', encoding='utf-8')
+    assert list(iter_rss_sites(path)) == []
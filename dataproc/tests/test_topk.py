@@ -0,0 +1,57 @@
+"""
+topk.SpaceSaving のテスト
+"""
+
+import random
+import sys
+from collections import Counter
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "scripts"))
+from topk import SpaceSaving
+
+
+def test_exact_without_eviction():
+    """監視語数が capacity 以内なら Counter と同じ頻度・並びで、誤差は 0"""
+    words = "a b a c b a d".split()
+    tracker = SpaceSaving(10)
+    tracker.update(Counter(words))
+    assert tracker.most_common(3) == [(item, count, 0) for item, count in Counter(words).most_common(3)]
+    assert tracker.error_bound() == 0
+
+
+def test_eviction_replaces_minimum():
+    """満杯のときは推定頻度が最小の語を追い出し、その頻度を誤差として引き継ぐ"""
+    tracker = SpaceSaving(2)
+    tracker.add("a", 5)
+    tracker.add("b", 2)
+    tracker.add("a")  # 監視中の語はヒープを更新しない（追い出し時に積み直す）
+    tracker.add("c", 3)
+    assert tracker.counts == {"a": 6, "c": 5}
+    assert tracker.errors == {"a": 0, "c": 2}
+    assert tracker.evictions == 1
+
+    tracker.add("d")
+    assert "c" not in tracker.counts
+    assert tracker.most_common(2) == [("a", 6, 0), ("d", 6, 5)]
+
+
+def test_error_bound_holds():
+    """真の頻度は frequency - error 以上 frequency 以下、誤差は N / capacity 以下、それを超える頻度の語は必ず監視中"""
+    rng = random.Random(0)
+    words = [f"w{min(int(rng.paretovariate(1.2)), 500)}" for _ in range(20_000)]
+    truth = Counter(words)
+    tracker = SpaceSaving(50)
+    for start in range(0, len(words), 100):
+        tracker.update(Counter(words[start:start + 100]))
+
+    assert tracker.total == len(words)
+    assert tracker.evictions > 0
+    bound = tracker.error_bound()
+    assert bound == len(words) / 50
+    for item, count in tracker.counts.items():
+        assert count - tracker.errors[item] <= truth[item] <= count
+        assert tracker.errors[item] <= bound
+    for item, count in truth.items():
+        if count > bound:
+            assert item in tracker.counts
@@ -0,0 +1,45 @@
+"""
+user_dict（MeCab ユーザー辞書）のテスト
+"""
+
+import sys
+from pathlib import Path
+
+import fugashi
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "scripts"))
+from user_dict import load_user_dict, segmentation_changes, surfaces, user_dict_words
+
+VARIANTS = ["ジェミニ", "ミッドジャーニー", "コードラマ", "クロード", "ChatGPT", "Stable Diffusion"]
+NON_TOOL_TEXTS = [
+    "ジェミニーズの新作が発売された",
+    "クロードミトスの解説記事",
+    "今日は天気が良いので散歩に行きます",
+    "コードをラマで書く",
+]
+
+
+def test_registered_words_are_single_tokens(tmp_path):
+    """登録語は1語になり、ASCII・空白入り・システム辞書で既に1語の表記は登録しない"""
+    system_tagger = fugashi.Tagger()
+    words = user_dict_words(VARIANTS, system_tagger)
+    assert "ChatGPT" not in words and "Stable Diffusion" not in words
+    assert "クロード" not in words
+
+    path, _ = load_user_dict(VARIANTS, system_tagger, cache_dir=tmp_path)
+    tagger = fugashi.Tagger(f'-u "{path}"')
+    for word in words:
+        assert surfaces(tagger, word) == [word]
+    assert "ミッドジャーニー" in surfaces(tagger, "ミッドジャーニーで画像を作る")
+
+
+def test_non_tool_text_segmentation_unchanged(tmp_path):
+    """登録語を含まない本文の分割はシステム辞書だけのときと同じ"""
+    system_tagger = fugashi.Tagger()
+    words = set(user_dict_words(VARIANTS, system_tagger))
+    path, _ = load_user_dict(VARIANTS, system_tagger, cache_dir=tmp_path)
+    tagger = fugashi.Tagger(f'-u "{path}"')
+    for text in NON_TOOL_TEXTS:
+        assert surfaces(tagger, text) == surfaces(system_tagger, text)
+        assert segmentation_changes(system_tagger, tagger, text, words) == []
+    assert segmentation_changes(system_tagger, tagger, "ジェミニとミッドジャーニーを比べる", words) == []
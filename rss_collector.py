@@ -1,17 +1,19 @@
 #!/usr/bin/env python3
 """
 GitHub Actions対応RSS収集システム
-毎日自動実行で27サイトからRSS収集し、JSONファイルに保存
+毎日自動実行で27サイトからRSS収集し、JSONファイルに保存（環境変数 RSS_STORAGE_FORMAT=parquet で Parquet）
 """
 
-import feedparser
-import json
 import os
 import re
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
 import time
 import hashlib
+from rss_io import find_rss_file, iter_rss_articles, write_rss
+from rss_fetch import MAX_WORKERS, FeedState, fetch_feeds, parse_fetched
+from rss_seen import SeenIndex
+from rss_dates import PublishedDateParser
 
 def get_rss_feeds():
     """27サイトのRSS URL一覧"""
@@ -75,44 +77,12 @@ def clean_text(text):
     text = re.sub(r'\s+', ' ', text)
     return text.strip()
 
-def parse_published_date(published_str):
-    """published文字列を日付オブジェクトに変換"""
-    if not published_str:
-        return None
+def collect_daily_rss(max_workers=MAX_WORKERS, feed_state=None, seen_index=None):
+    """当日のRSS記事を収集（取得は並列、パース・集計はサイト順）
     
-    # タイムゾーン付きISO形式の特別処理（The Verge等）
-    if 'T' in published_str and ('+' in published_str or '-' in published_str[-6:]):
-        try:
-            # 2025-06-09T11:24:23-04:00 形式
-            # タイムゾーン部分を除去
-            clean_str = re.sub(r'[+-]\d{2}:\d{2}$', '', published_str)
-            return datetime.strptime(clean_str, '%Y-%m-%dT%H:%M:%S')
-        except:
-            pass
-    
-    # 標準的な日付形式を試行
-    formats = [
-        '%a, %d %b %Y %H:%M:%S %z',     # Mon, 09 Jun 2025 09:35:00 +0000
-        '%a, %d %b %Y %H:%M:%S',        # Mon, 09 Jun 2025 09:35:00
-        '%Y-%m-%dT%H:%M:%S%z',          # 2025-06-09T09:35:00+00:00
-        '%Y-%m-%dT%H:%M:%S',            # 2025-06-09T09:35:00
-        '%Y-%m-%d %H:%M:%S',            # 2025-06-09 09:35:00
-        '%Y-%m-%d',                     # 2025-06-09
-    ]
-    
-    for fmt in formats:
-        try:
-            # タイムゾーン情報があれば除去して処理
-            clean_str = published_str.replace(' +0000', '').replace(' +0900', '').replace(' GMT', '').replace('Z', '')
-            return datetime.strptime(clean_str, fmt.replace('%z', ''))
-        except:
-            continue
-    
-    # 全形式で失敗した場合はNone
-    return None
-
-def collect_daily_rss():
-    """当日のRSS記事を収集"""
+    feed_state（FeedState）を渡すと条件付きGETし、前回から変更のないフィードは新着なしとしてパースを省略
+    seen_index（SeenIndex）を渡すと前日以前に保存した記事を除き、新着記事だけを格納
+    """
     rss_feeds = get_rss_feeds()
     today = datetime.now().strftime('%Y-%m-%d')
     
@@ -123,24 +93,52 @@ def collect_daily_rss():
     }
     
     successful_sites = 0
+    cached_sites = 0
     total_articles = 0
+    total_seen = 0
     
     print(f"📡 RSS収集開始: {today}")
     print(f"📊 対象サイト: {len(rss_feeds)}サイト")
+    
+    # RSS取得（同時 max_workers 本、同じホストへは間隔を空けて1本ずつ）
+    fetch_start = time.perf_counter()
+    fetched_feeds = fetch_feeds(rss_feeds, max_workers=max_workers, state=feed_state)
+    print(f"⏱️  取得時間: {time.perf_counter() - fetch_start:.1f}秒（同時{max_workers}本）")
     print("-" * 50)
     
     for site_name, rss_url in rss_feeds.items():
-        print(f"🔄 処理中: {site_name}")
+        fetched, fetch_seconds = fetched_feeds[site_name]
+        print(f"🔄 処理中: {site_name}（取得 {fetch_seconds:.1f}秒）")
         
         try:
-            # RSS取得
-            feed = feedparser.parse(rss_url)
+            # 取得時の例外（タイムアウト等）はここでサイトのエラーとして記録
+            if isinstance(fetched, Exception):
+                raise fetched
+            
+            # 前回から変更なし（304・同じ本文）→ 新着なしとしてパースを省略
+            unchanged = feed_state.unchanged_reason(rss_url, fetched) if feed_state is not None else None
+            if unchanged:
+                result["sites"][site_name] = {
+                    "url": rss_url,
+                    "articles_count": 0,
+                    "articles": [],
+                    "status": "success",
+                    "from_cache": True
+                }
+                feed_state.update(rss_url, fetched)  # 本文が同じでも ETag・Last-Modified は更新
+                successful_sites += 1
+                cached_sites += 1
+                print(f"  ♻️  変更なし（{unchanged}）: パース省略")
+                continue
+            
+            feed = parse_fetched(fetched)
             
             # エラーチェック
             if feed.bozo:
                 print(f"  ⚠️  警告: RSS解析エラー（続行）")
             
             articles = []
+            seen_count = 0
             
             # 各記事を処理
             for entry in feed.entries:
@@ -161,8 +159,16 @@ def collect_daily_rss():
                     article['id'] = article_id
                     
                     # 空のタイトルは除外
-                    if article['title']:
-                        articles.append(article)
+                    if not article['title']:
+                        continue
+                    
+                    # 前日以前に保存済みの記事は除外
+                    if seen_index is not None:
+                        if not seen_index.is_new(article_id):
+                            seen_count += 1
+                            continue
+                        seen_index.add(article_id)
+                    articles.append(article)
                 
                 except Exception as e:
                     print(f"    ❌ 記事処理エラー: {str(e)}")
@@ -172,15 +178,17 @@ def collect_daily_rss():
                 "url": rss_url,
                 "articles_count": len(articles),
                 "articles": articles,
-                "status": "success"
+                "status": "success",
+                "from_cache": False,
+                "seen_articles": seen_count
             }
+            if feed_state is not None:
+                feed_state.update(rss_url, fetched)
             
             successful_sites += 1
             total_articles += len(articles)
-            print(f"  ✅ 完了: {len(articles)}件取得")
-            
-            # サーバー負荷軽減
-            time.sleep(1)
+            total_seen += seen_count
+            print(f"  ✅ 完了: {len(articles)}件取得（保存済み {seen_count}件を除外）")
             
         except Exception as e:
             result["sites"][site_name] = {
@@ -196,36 +204,32 @@ def collect_daily_rss():
     result["summary"] = {
         "successful_sites": successful_sites,
         "failed_sites": len(rss_feeds) - successful_sites,
-        "total_articles": total_articles
+        "cached_sites": cached_sites,
+        "total_articles": total_articles,
+        "seen_articles": total_seen
     }
     
     print("-" * 50)
     print(f"📈 収集完了サマリー:")
-    print(f"  成功: {successful_sites}/{len(rss_feeds)}サイト")
-    print(f"  総記事数: {total_articles}件")
+    print(f"  成功: {successful_sites}/{len(rss_feeds)}サイト（変更なし: {cached_sites}サイト）")
+    print(f"  総記事数: {total_articles}件（保存済み {total_seen}件を除外）")
     
     return result
 
-def save_daily_data(data):
-    """当日のデータをJSONファイルに保存"""
-    # データディレクトリ作成
+def save_daily_data(data, storage=None):
+    """当日のデータを保存（storage: "json" / "parquet"、未指定は環境変数 RSS_STORAGE_FORMAT → json）"""
     data_dir = Path("data/rss/daily")
-    data_dir.mkdir(parents=True, exist_ok=True)
     
     # ファイル名生成（JST基準）
     jst_time = datetime.utcnow() + timedelta(hours=9)
     today = jst_time.strftime('%Y%m%d')
-    filename = data_dir / f"rss_{today}.json"
-    
-    # JSON保存
-    with open(filename, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    filename = write_rss(data, data_dir, f"rss_{today}", storage)
     
     print(f"💾 ファイル保存: {filename}")
     return str(filename)
 
-def create_weekly_summary():
-    """過去7日分のデータを統合（週末実行用）"""
+def create_weekly_summary(storage=None):
+    """過去7日分のデータを統合（週末実行用、storage は save_daily_data と同じ）"""
     daily_dir = Path("data/rss/daily")
     weekly_dir = Path("data/rss/weekly")
     weekly_dir.mkdir(parents=True, exist_ok=True)
@@ -245,32 +249,29 @@ def create_weekly_summary():
     
     for i in range(7):
         date = datetime.now() - timedelta(days=i)
-        filename = daily_dir / f"rss_{date.strftime('%Y%m%d')}.json"
+        filename = find_rss_file(daily_dir, f"rss_{date.strftime('%Y%m%d')}")
         
-        if filename.exists():
+        if filename is not None:
             print(f"📁 読み込み: {filename}")
             daily_files_list.append(str(filename))  # ログ用リストに追加
             
             try:
-                with open(filename, 'r', encoding='utf-8') as f:
-                    daily_data = json.load(f)
-                
-                # 全記事を統合
-                for site_name, site_data in daily_data.get("sites", {}).items():
-                    if site_data.get("status") == "success":
-                        for article in site_data.get("articles", []):
-                            article["site"] = site_name
-                            article["collection_date"] = date.strftime('%Y-%m-%d')
-                            weekly_data["all_articles"].append(article)
+                # 全記事を統合（収集成功サイトのみ、サイト単位で逐次読み込み）
+                for site_name, article in iter_rss_articles(filename):
+                    article["site"] = site_name
+                    article["collection_date"] = date.strftime('%Y-%m-%d')
+                    weekly_data["all_articles"].append(article)
                 
             except Exception as e:
                 print(f"❌ ファイル読み込みエラー: {filename} - {str(e)}")
     
     print(f"📊 統合前記事数: {len(weekly_data['all_articles'])}件")
     
-    # 📅 日付フィルタリング（7日以内の記事のみ保持）
-    seven_days_ago = datetime.now() - timedelta(days=7)
+    # 📅 日付フィルタリング（7日以内の記事のみ保持、タイムゾーンを考慮して比較）
+    seven_days_ago = datetime.now(timezone.utc) - timedelta(days=7)
+    date_parser = PublishedDateParser()
     filtered_articles = []
+    published_dates = []  # filtered_articles と同じ順の解析済み日時（各記事1回だけ解析）
     
     date_parse_success = 0
     date_parse_failed = 0
@@ -280,15 +281,17 @@ def create_weekly_summary():
     
     for article in weekly_data["all_articles"]:
         published = article.get('published', '')
-        parsed_date = parse_published_date(published)
+        parsed_date = date_parser.parse(published, article["site"])
         
         if parsed_date is None:
             # 日付不明の記事は7日以内として扱う（保持）
             filtered_articles.append(article)
+            published_dates.append(None)
             date_parse_failed += 1
         elif parsed_date >= seven_days_ago:
             # 7日以内の記事は保持
             filtered_articles.append(article)
+            published_dates.append(parsed_date)
             date_parse_success += 1
         else:
             # 7日より古い記事は除外
@@ -302,29 +305,28 @@ def create_weekly_summary():
     print(f"  7日より古い（除外）: {filtered_out}件")
     print(f"  フィルタリング後: {len(filtered_articles)}件")
     
-    # 重複記事除去
+    # 重複記事除去（解析済み日時も一緒に保持）
     unique_articles = {}
-    for article in weekly_data["all_articles"]:
+    for article, parsed_date in zip(weekly_data["all_articles"], published_dates):
         article_id = article.get("id")
         if article_id and article_id not in unique_articles:
-            unique_articles[article_id] = article
+            unique_articles[article_id] = (article, parsed_date)
     
-    weekly_data["all_articles"] = list(unique_articles.values())
+    weekly_data["all_articles"] = [article for article, _ in unique_articles.values()]
     weekly_data["total_unique_articles"] = len(unique_articles)
     
     print(f"🔄 重複除去後: {len(unique_articles)}件")
     
     # サイト別グループ化（スリム化された出力形式）
     sites_grouped = {}
-    for article in weekly_data["all_articles"]:
+    for article, parsed in unique_articles.values():
         site = article["site"]
         if site not in sites_grouped:
             sites_grouped[site] = []
         
-        # 日付を簡潔な形式に変換
+        # 日付を簡潔な形式に変換（記事に書かれたタイムゾーンでの日付）
         published_date = ""
         if article.get("published"):
-            parsed = parse_published_date(article["published"])
             if parsed:
                 published_date = parsed.strftime("%Y-%m-%d")
             else:
@@ -358,9 +360,7 @@ def create_weekly_summary():
     
     # 週間サマリー保存（JST基準）
     jst_time = datetime.utcnow() + timedelta(hours=9)
-    week_filename = weekly_dir / f"weekly_summary_{jst_time.strftime('%Y%m%d')}.json"
-    with open(week_filename, 'w', encoding='utf-8') as f:
-        json.dump(weekly_data, f, ensure_ascii=False, indent=2)
+    week_filename = write_rss(weekly_data, weekly_dir, f"weekly_summary_{jst_time.strftime('%Y%m%d')}", storage)
     
     print(f"📊 週間サマリー保存: {week_filename}")
     print(f"📈 最終統計: {len(daily_files_list)}日分、{weekly_data['total_articles']}件")
@@ -382,8 +382,14 @@ def main():
         else:
             print("📅 日次RSS収集モード")
             # 日次RSS収集
-            data = collect_daily_rss()
+            collection_date = datetime.now().strftime('%Y-%m-%d')
+            feed_state = FeedState(collection_date=collection_date)
+            seen_index = SeenIndex(collection_date=collection_date)
+            data = collect_daily_rss(feed_state=feed_state, seen_index=seen_index)
             save_daily_data(data)
+            # 日次データの保存後に更新（保存前に落ちた場合は次回も全件取得）
+            seen_index.save()
+            feed_state.save()
         
         print("✅ 処理完了")
         
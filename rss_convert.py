@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+RSS日次・週次データの保存形式の一括変換（JSON ⇔ Parquet）
+- ディレクトリ内の全ファイルを一時ディレクトリに変換・読み戻して照合してから変換先に置く
+  （一致しないファイルは変換せずに表示し、変換元も残す。--delete 指定時は比較の表示後に照合できた変換元を削除）
+- 変換前後の合計サイズと、全ファイルの読み込み時間（load_rss・記事単位の逐次読み込み）を表示
+- 例: python rss_convert.py --to parquet --delete
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from rss_io import STORAGE_FORMATS, iter_rss_articles, load_rss, write_rss_file
+
+RSS_DIRS = [(Path("data/rss/daily"), "rss_"), (Path("data/rss/weekly"), "weekly_summary_")]
+
+
+def time_loads(paths):
+    """全ファイルの読み込み時間 → (load_rss の秒数, iter_rss_articles の秒数)"""
+    start = time.perf_counter()
+    for path in paths:
+        load_rss(path)
+    load_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for path in paths:
+        for _ in iter_rss_articles(path):
+            pass
+    return load_time, time.perf_counter() - start
+
+
+def convert_dir(directory, prefix, storage):
+    """ディレクトリ内の他形式のファイルを storage 形式に変換 → ([(変換元, 変換先), ...], [照合できなかった変換元, ...])
+
+    全ファイルを照合し終えてから置くので、途中のファイルが一致しなくても変換の途中で止まらない
+    """
+    suffix = STORAGE_FORMATS[storage]
+    converted = []
+    mismatched = []
+    # 置き換えが rename で済むように同じディレクトリ内に作る（prefix で始まらないので変換対象にならない）
+    with tempfile.TemporaryDirectory(dir=directory, prefix=".convert_") as staging_dir:
+        staged = []
+        for source in sorted(directory.glob(f"{prefix}*")):
+            if source.suffix == suffix or source.suffix not in STORAGE_FORMATS.values():
+                continue
+            data = load_rss(source)
+            staging = write_rss_file(data, Path(staging_dir) / source.with_suffix(suffix).name)
+            if load_rss(staging) != data:
+                mismatched.append(source)
+                continue
+            staged.append((source, staging))
+
+        for source, staging in staged:
+            converted.append((source, staging.replace(source.with_suffix(suffix))))
+    return converted, mismatched
+
+
+def main():
+    """日次・週次ディレクトリの全ファイルを変換し、サイズと読み込み時間を比較"""
+    parser = argparse.ArgumentParser(description="RSSデータの保存形式の一括変換")
+    parser.add_argument('--to', choices=sorted(STORAGE_FORMATS), default='parquet', help='変換先の形式')
+    parser.add_argument('--delete', action='store_true', help='照合できた変換元を削除')
+    args = parser.parse_args()
+
+    for directory, prefix in RSS_DIRS:
+        if not directory.exists():
+            continue
+        converted, mismatched = convert_dir(directory, prefix, args.to)
+        for source in mismatched:
+            print(f"Warning: round trip mismatch, not converted: {source}")
+        if not converted:
+            print(f"{directory}: nothing to convert")
+            continue
+
+        sources = [source for source, _ in converted]
+        targets = [target for _, target in converted]
+        source_size = sum(path.stat().st_size for path in sources)
+        target_size = sum(path.stat().st_size for path in targets)
+        source_load, source_iter = time_loads(sources)
+        target_load, target_iter = time_loads(targets)
+        print(f"{directory}: {len(converted)} files -> {args.to}")
+        print(f"  {'':<18} {sources[0].suffix:>10} {targets[0].suffix:>10}   ratio")
+        print(f"  {'size (MB)':<18} {source_size / 1e6:10.1f} {target_size / 1e6:10.1f} "
+              f"{source_size / target_size:7.1f}x")
+        print(f"  {'load_rss (s)':<18} {source_load:10.2f} {target_load:10.2f} {source_load / target_load:7.1f}x")
+        print(f"  {'iter articles (s)':<18} {source_iter:10.2f} {target_iter:10.2f} "
+              f"{source_iter / target_iter:7.1f}x")
+
+        if args.delete:
+            for source in sources:
+                source.unlink()
+            print(f"  deleted {len(sources)} {sources[0].suffix} files")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+RSS記事の published 文字列の解析
+- ISO 8601（2025-06-09T11:24:23-04:00、...Z）と RFC 2822（Mon, 09 Jun 2025 09:35:00 +0000 / GMT）に対応
+- タイムゾーンは除去せず、タイムゾーン付き datetime として返す（表記なしは UTC とみなす）
+- サイトごとに前回成功した形式から試す（同じサイトの記事はほぼ同じ形式）
+- python rss_dates.py で data/rss/daily の全日付を対象に旧実装と速度・結果を比較
+"""
+
+import argparse
+import email.utils
+import re
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+
+RFC_2822 = re.compile(
+    r'(?:[A-Za-z]{3},\s*)?(\d{1,2})\s+([A-Za-z]{3})\s+(\d{4})\s+(\d{1,2}):(\d{2})(?::(\d{2}))?'
+    r'\s*([+-]\d{4}|GMT|UTC|UT|Z)?$'
+)
+MONTHS = {name: f"{index:02d}" for index, name in enumerate(
+    ['jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec'], start=1)}
+UTC_ZONES = {'GMT': '+00:00', 'UTC': '+00:00', 'UT': '+00:00', 'Z': '+00:00', None: ''}
+DAILY_DIR = Path("data/rss/daily")
+
+
+def parse_iso(text):
+    """ISO 8601（日付のみ・Z・±hh:mm を含む）"""
+    return datetime.fromisoformat(text)
+
+
+def parse_rfc2822(text):
+    """RFC 2822 の一般的な表記（数値オフセット・GMT/UTC）を正規表現で解析（一致しなければ None）
+
+    各項目を int にして datetime を組み立てるより、ISO 形式に並べ替えて fromisoformat に渡す方が速い
+    """
+    match = RFC_2822.match(text)
+    if match is None:
+        return None
+    day, month, year, hour, minute, second, zone = match.groups()
+    month = MONTHS.get(month.lower())
+    if month is None:
+        return None
+    return datetime.fromisoformat(
+        f"{year}-{month}-{day.zfill(2)}T{hour.zfill(2)}:{minute}:{second or '00'}{UTC_ZONES.get(zone, zone)}"
+    )
+
+
+def parse_email_date(text):
+    """RFC 2822 の残りの表記（EST 等のタイムゾーン名・秒なし等）は標準ライブラリで解析"""
+    return email.utils.parsedate_to_datetime(text)
+
+
+PARSERS = (parse_rfc2822, parse_iso, parse_email_date)
+
+
+class PublishedDateParser:
+    """published 文字列 → タイムゾーン付き datetime（サイトごとに前回成功した形式から試す）"""
+
+    def __init__(self):
+        self.site_parser = {}  # サイト名 → PARSERS の添字
+        self.stats = Counter()
+
+    def parse(self, text, site=None):
+        """解析できなければ None"""
+        if not text:
+            return None
+        text = text.strip()
+
+        # 大半は前回と同じ形式なので、まずそれだけ試す
+        first = self.site_parser.get(site, 0)
+        try:
+            parsed = PARSERS[first](text)
+        except (ValueError, TypeError, OverflowError):
+            parsed = None
+        if parsed is not None:
+            self.stats['memo_hits'] += 1
+            return parsed if parsed.tzinfo is not None else parsed.replace(tzinfo=timezone.utc)
+
+        for offset in range(1, len(PARSERS)):
+            index = (first + offset) % len(PARSERS)
+            try:
+                parsed = PARSERS[index](text)
+            except (ValueError, TypeError, OverflowError):
+                continue
+            if parsed is None:
+                continue
+
+            self.site_parser[site] = index
+            self.stats['memo_misses'] += 1
+            if parsed.tzinfo is None:
+                parsed = parsed.replace(tzinfo=timezone.utc)
+            return parsed
+
+        self.stats['failed'] += 1
+        return None
+
+
+def legacy_parse_published_date(published_str):
+    """旧実装（rss_collector.parse_published_date）: 比較用。タイムゾーンを除去した naive datetime を返す"""
+    if not published_str:
+        return None
+
+    if 'T' in published_str and ('+' in published_str or '-' in published_str[-6:]):
+        try:
+            clean_str = re.sub(r'[+-]\d{2}:\d{2}$', '', published_str)
+            return datetime.strptime(clean_str, '%Y-%m-%dT%H:%M:%S')
+        except:
+            pass
+
+    formats = [
+        '%a, %d %b %Y %H:%M:%S %z',
+        '%a, %d %b %Y %H:%M:%S',
+        '%Y-%m-%dT%H:%M:%S%z',
+        '%Y-%m-%dT%H:%M:%S',
+        '%Y-%m-%d %H:%M:%S',
+        '%Y-%m-%d',
+    ]
+
+    for fmt in formats:
+        try:
+            clean_str = published_str.replace(' +0000', '').replace(' +0900', '').replace(' GMT', '').replace('Z', '')
+            return datetime.strptime(clean_str, fmt.replace('%z', ''))
+        except:
+            continue
+
+    return None
+
+
+def load_daily_dates(daily_dir=DAILY_DIR):
+    """日次ファイルの (サイト名, published) を全件読み込み"""
+    # 読み込みはリポジトリ直下の rss_io を使う（記事単位で逐次パース）
+    from rss_io import iter_rss_articles, list_rss_files
+
+    dates = []
+    for path in list_rss_files(daily_dir, "rss_"):
+        for site_name, article in iter_rss_articles(path):
+            dates.append((site_name, article.get('published', '')))
+    return dates
+
+
+def time_parser(name, parse, dates, repeat):
+    """全件解析の最短時間を表示"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for site_name, text in dates:
+            parse(text, site_name)
+        best = min(best, time.perf_counter() - start)
+    print(f"  {name:<10} {best:8.3f} s  {best / len(dates) * 1e6:6.2f} us/date")
+    return best
+
+
+def main():
+    """data/rss/daily の published を旧実装・新実装で解析して比較"""
+    parser = argparse.ArgumentParser(description="published 日付解析のベンチマーク")
+    parser.add_argument('--daily-dir', type=Path, default=DAILY_DIR, help='日次RSSディレクトリ')
+    parser.add_argument('--repeat', type=int, default=3, help='繰り返し回数（最短時間を採用）')
+    args = parser.parse_args()
+
+    dates = load_daily_dates(args.daily_dir)
+    print(f"Dates: {len(dates)} ({sum(1 for _, text in dates if text)} non-empty, "
+          f"{len(set(text for _, text in dates))} distinct)")
+
+    legacy_time = time_parser("legacy", lambda text, site: legacy_parse_published_date(text), dates, args.repeat)
+    date_parser = PublishedDateParser()
+    new_time = time_parser("memoized", date_parser.parse, dates, args.repeat)
+    print(f"  speedup    {legacy_time / new_time:8.1f} x")
+
+    # 結果の比較（旧実装は時差を除去した現地時刻なので、現地時刻同士で比較）
+    outcome = Counter()
+    examples = {}
+    for site_name, text in dates:
+        legacy = legacy_parse_published_date(text)
+        parsed = date_parser.parse(text, site_name)
+        if legacy is None and parsed is None:
+            kind = "both failed"
+        elif legacy is None:
+            kind = "new only"
+        elif parsed is None:
+            kind = "legacy only"
+        elif legacy == parsed.replace(tzinfo=None):
+            kind = "same local time"
+        else:
+            kind = "different"
+        outcome[kind] += 1
+        examples.setdefault(kind, text)
+    for kind, count in outcome.most_common():
+        print(f"  {kind:<16} {count:8d}  e.g. {examples[kind]!r}")
+    print(f"  memo: {dict(date_parser.stats)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""
+RSSフィードの並列取得
+- 上限付きスレッドプールで複数フィードを同時に取得し、パース（feedparser）は取得後に呼び出し側で行う
+- 同じホストへは同時に1リクエストまで、開始間隔も空ける（hnrss.org は5フィードを配信）
+- リクエストごとのタイムアウト（接続・受信の各待ち時間）
+- 取得は feedparser と同じ処理（リクエストヘッダ・gzip展開・エラー時の扱い）なので、
+  parse_fetched の結果は feedparser.parse(url) と一致する
+- 前回の ETag・Last-Modified で条件付きGETし、304 または本文が前回と同じならパース不要と判定（FeedState）
+"""
+
+import hashlib
+import io
+import json
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+import feedparser
+from feedparser.http import get as http_get
+
+MAX_WORKERS = 8  # 同時に取得するフィード数の上限
+HOST_INTERVAL = 1.0  # 同じホストへのリクエスト開始間隔（秒）
+TIMEOUT = 30  # 接続・受信それぞれの待ち時間の上限（秒）
+STATE_PATH = Path("data/rss/feed_state.json")  # 条件付きGET用の前回取得情報（日次データと一緒にコミット）
+
+
+class TimeoutHandler(urllib.request.BaseHandler):
+    """feedparser の取得にタイムアウトを設定（urllib のリクエスト前処理で上書き）"""
+
+    def __init__(self, timeout):
+        self.timeout = timeout
+
+    def http_request(self, request):
+        request.timeout = self.timeout
+        return request
+
+    https_request = http_request
+
+
+class HostLimiter:
+    """ホストごとに同時1リクエスト・開始間隔 interval 秒以上に制限"""
+
+    def __init__(self, interval=HOST_INTERVAL):
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.host_locks = {}
+        self.last_start = {}
+
+    @contextmanager
+    def slot(self, host):
+        """with limiter.slot(host): の間だけそのホストへのリクエストを許可"""
+        with self.lock:
+            host_lock = self.host_locks.setdefault(host, threading.Lock())
+        with host_lock:
+            wait = self.last_start.get(host, float('-inf')) + self.interval - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            self.last_start[host] = time.monotonic()
+            yield
+
+
+def feed_host(url):
+    """レート制限の単位（ホスト名）"""
+    return urllib.parse.urlsplit(url).hostname or url
+
+
+def interleave_by_host(feeds):
+    """同じホストのフィードが続かないように並べ替え（待機中のスレッドでプールが埋まらないように）
+
+    各ホストの1本目を元の順で並べ、次に2本目、... の順
+    """
+    rank = {}
+    keyed = []
+    for index, (name, url) in enumerate(feeds.items()):
+        host = feed_host(url)
+        keyed.append((rank.get(host, 0), index, name, url))
+        rank[host] = rank.get(host, 0) + 1
+    return [(name, url) for _, _, name, url in sorted(keyed)]
+
+
+class FeedState:
+    """フィード URL → 前回取得時の {etag, modified, body_hash, collection_date}（条件付きGET・変更なしの判定用）
+
+    同じ収集日に記録した分は使わない（同日の再実行は日次ファイルを上書きするので全件取り直す）
+    """
+
+    def __init__(self, path=STATE_PATH, collection_date=None):
+        self.path = Path(path)
+        self.collection_date = collection_date or datetime.now().strftime('%Y-%m-%d')
+        self.entries = {}
+        if self.path.exists():
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Warning: failed to load {self.path}: {e}")
+
+    def previous(self, url):
+        """前日以前の収集で記録した情報（なければ空）"""
+        entry = self.entries.get(url, {})
+        if entry.get('collection_date', '') >= self.collection_date:
+            return {}
+        return entry
+
+    def request_args(self, url):
+        """fetch_feed に渡す etag・modified（前回の記録がなければ空）"""
+        entry = self.previous(url)
+        return {key: entry[key] for key in ('etag', 'modified') if entry.get(key)}
+
+    def unchanged_reason(self, url, fetched):
+        """前回から変更なしと判定できる理由（"not_modified" / "same_body"、変更ありは None）"""
+        if fetched.get('status') == 304:
+            return "not_modified"
+        body_hash = fetched.get('body_hash')
+        if body_hash and body_hash == self.previous(url).get('body_hash'):
+            return "same_body"  # 条件付きGET非対応のサーバー
+        return None
+
+    def update(self, url, fetched):
+        """取得できた本文の情報を記録（304・エラー時は前回の記録を残す）
+
+        collection_date は本文を日次データに格納した日（本文が前回と同じなら前回の日付のまま）
+        """
+        if fetched.get('status') != 200 or not fetched.get('body_hash'):
+            return
+        entry = self.entries.get(url, {})
+        same_body = entry.get('body_hash') == fetched['body_hash']
+        self.entries[url] = {
+            'etag': fetched.get('etag', ''),
+            'modified': fetched.get('modified', ''),
+            'body_hash': fetched['body_hash'],
+            'collection_date': entry['collection_date'] if same_body else self.collection_date,
+        }
+
+    def save(self):
+        """JSON保存（途中で落ちても壊れないように一時ファイル経由）"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(dict(sorted(self.entries.items())), f, ensure_ascii=False, indent=2)
+        tmp_path.replace(self.path)
+
+
+def fetch_feed(url, timeout=TIMEOUT, etag=None, modified=None):
+    """フィードを取得（パースはしない）→ feedparser の結果 dict（data: 本文bytes、body_hash・headers・href・status 等）
+
+    etag・modified を渡すと条件付きGET（変更がなければ status 304・本文なし）。
+    URLError は feedparser.parse と同じく bozo として結果に格納、それ以外の例外（受信タイムアウト等）は送出
+    """
+    result = feedparser.FeedParserDict(bozo=False, entries=[], feed=feedparser.FeedParserDict(), headers={})
+    try:
+        result['data'] = http_get(url, etag, modified, handlers=[TimeoutHandler(timeout)], result=result)
+    except urllib.error.URLError as error:
+        result.update({'bozo': True, 'bozo_exception': error, 'data': None})
+    if result['data']:
+        result['body_hash'] = hashlib.sha256(result['data']).hexdigest()
+    return result
+
+
+def parse_fetched(fetched):
+    """fetch_feed の結果を feedparser でパース（取得失敗・本文なしは entries 空の結果をそのまま返す）"""
+    data = fetched.get('data')
+    if not data:
+        return fetched
+    # 相対URLの解決に使う取得先URLは Content-Location として渡す（feedparser.parse(url) と同じ基準URI）
+    headers = dict(fetched['headers'])
+    headers['content-location'] = urllib.parse.urljoin(fetched.get('href', ''), headers.get('content-location', ''))
+    # 文字列のままだと URL・ファイルパスと解釈されうるのでストリームで渡す
+    feed = feedparser.parse(io.BytesIO(data), response_headers=headers)
+    for key in ('href', 'status', 'etag', 'modified'):
+        if key in fetched:
+            feed[key] = fetched[key]
+    return feed
+
+
+def fetch_feeds(feeds, max_workers=MAX_WORKERS, timeout=TIMEOUT, interval=HOST_INTERVAL, state=None):
+    """{名前: URL} のフィードを並列取得 → {名前: (fetch_feed の結果 or 送出された例外, 取得の秒数)}
+
+    結果の順序は feeds と同じ。全体の所要時間はおおむね最も遅いホストの合計時間になる。
+    state（FeedState）を渡すと前回の ETag・Last-Modified で条件付きGETする
+    """
+    limiter = HostLimiter(interval)
+
+    def fetch(url):
+        request_args = state.request_args(url) if state is not None else {}
+        with limiter.slot(feed_host(url)):
+            start = time.perf_counter()
+            try:
+                fetched = fetch_feed(url, timeout, **request_args)
+            except Exception as e:
+                fetched = e
+            return fetched, time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        futures = {name: executor.submit(fetch, url) for name, url in interleave_by_host(feeds)}
+        return {name: futures[name].result() for name in feeds}
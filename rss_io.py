@@ -0,0 +1,358 @@
+"""
+RSSデータ（日次・週次）の読み書き
+- json.load でファイル全体を展開せず、パースしながらサイト単位で記事を返す
+- 週次: {"week_start": ..., "sites": {サイト名: [記事, ...]}}
+- 日次: {"collection_date": ..., "sites": {サイト名: {"url": ..., "articles": [記事, ...], "status": ...}}}
+- JSON の代わりに Parquet（zstd 圧縮、1行 = 1記事、サイト名は辞書エンコード）でも保存できる
+  - 記事以外の項目（収集日・サイトの URL・status 等）はスキーマのメタデータに JSON で格納
+  - 記事によって項目がない列は、値が null の項目と区別できるように記録（null がなければ null = 項目なし、あれば有無の列を追加）
+  - 読み込みは拡張子で判定するので、呼び出し側はどちらの形式でも同じ関数を使う
+  - pyarrow は Parquet を読み書きするときだけ import（JSON のみの環境では不要）
+"""
+
+import itertools
+import json
+import os
+import re
+from pathlib import Path
+
+CHUNK_SIZE = 1 << 16  # 64KBずつ読み込み
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+STORAGE_FORMATS = {"json": ".json", "parquet": ".parquet"}
+STORAGE_ENV = "RSS_STORAGE_FORMAT"  # 保存形式の指定（未指定は json）
+SITE_COLUMN = "site"
+PRESENCE_PREFIX = "__present__"  # 項目の有無の列名（値が null の記事と項目がない記事が混在する列のみ）
+PARQUET_METADATA_KEY = b"rss"
+PARQUET_FORMAT_VERSION = 2  # 1: null は項目なし（null の値は保存できない）
+PARQUET_ZSTD_LEVEL = 19  # 書き込みは1日1回なので圧縮率を優先（展開速度はレベルによらない）
+PARQUET_PAGE_SIZE = 1 << 22  # 1ファイル数百KBなので列ごとにほぼ1ページ（ページが大きいほど zstd が効く）
+
+_decoder = json.JSONDecoder()
+
+
+class JsonStream:
+    """ファイルを少しずつ読みながらJSONトークンを取り出す"""
+
+    def __init__(self, f):
+        self.f = f
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        """バッファに追加読み込み（未消費部分は保持）"""
+        if self.eof:
+            return False
+        chunk = self.f.read(CHUNK_SIZE)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """空白を読み飛ばして次の文字を返す（終端は空文字）"""
+        while True:
+            self.pos = WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, ch):
+        """次の文字が ch であることを確認して消費"""
+        found = self.peek()
+        if found != ch:
+            raise ValueError(f"Expected '{ch}' but found '{found}' in {getattr(self.f, 'name', 'stream')}")
+        self.pos += 1
+
+    def value(self):
+        """次のJSON値を1つ読み込む"""
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                # 値が途中で切れている → 追加読み込みして再試行
+                if self._fill():
+                    continue
+                raise
+            # 数値などバッファ末尾で終わる値は続きがある可能性
+            if end == len(self.buf) and self._fill():
+                continue
+            self.pos = end
+            return value
+
+    def iter_object(self):
+        """オブジェクトのキーを順に返す（値は呼び出し側が読む）"""
+        self.expect('{')
+        if self.peek() == '}':
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(':')
+            yield key
+            if self.peek() == ',':
+                self.pos += 1
+                continue
+            self.expect('}')
+            return
+
+    def iter_array(self):
+        """配列の要素を1つずつ読み込んで返す"""
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            if self.peek() == ',':
+                self.pos += 1
+                continue
+            self.expect(']')
+            return
+
+
+def iter_rss_sites(path, header=None):
+    """サイトごとに (サイト名, サイト情報, 記事リスト) を返す
+
+    header に dict を渡すと、sites 以外のトップレベル項目を格納する。
+    JSON ではメモリ上に保持するのは常に1サイト分の記事だけ（Parquet は圧縮後が小さいのでファイル単位で展開）。
+    """
+    if Path(path).suffix == STORAGE_FORMATS["parquet"]:
+        yield from _iter_parquet_sites(path, header)
+        return
+
+    with open(path, 'r', encoding='utf-8') as f:
+        stream = JsonStream(f)
+
+        for key in stream.iter_object():
+            if key != "sites":
+                value = stream.value()
+                if header is not None:
+                    header[key] = value
+                continue
+
+            for site_name in stream.iter_object():
+                if stream.peek() == '[':
+                    # 週次形式: サイト名 → 記事配列
+                    yield site_name, {}, list(stream.iter_array())
+                    continue
+
+                # 日次形式: サイト名 → {url, articles, status, ...}
+                site_info = {}
+                articles = []
+                for site_key in stream.iter_object():
+                    if site_key == "articles":
+                        articles = list(stream.iter_array())
+                    else:
+                        site_info[site_key] = stream.value()
+                yield site_name, site_info, articles
+
+
+def iter_rss_articles(path, header=None):
+    """(サイト名, 記事) を1件ずつ返す（収集エラーのサイトは除外）"""
+    for site_name, site_info, articles in iter_rss_sites(path, header):
+        if site_info.get("status", "success") != "success":
+            continue
+        for article in articles:
+            yield site_name, article
+
+
+def is_rss_file(path):
+    """RSSの日次・週次ファイルか（ファイル名で判定）"""
+    name = Path(path).name
+    return name.startswith("weekly_summary_") or name.startswith("rss_")
+
+
+def storage_format(storage=None):
+    """保存形式（引数 → 環境変数 RSS_STORAGE_FORMAT → json の順）"""
+    storage = storage or os.environ.get(STORAGE_ENV) or "json"
+    if storage not in STORAGE_FORMATS:
+        print(f"Warning: unknown {STORAGE_ENV} '{storage}', using json")
+        return "json"
+    return storage
+
+
+def find_rss_file(directory, stem):
+    """拡張子なしのファイル名に対応する既存ファイル（Parquet を優先、なければ None）"""
+    for suffix in (STORAGE_FORMATS["parquet"], STORAGE_FORMATS["json"]):
+        path = Path(directory) / f"{stem}{suffix}"
+        if path.exists():
+            return path
+    return None
+
+
+def list_rss_files(directory, prefix):
+    """prefix で始まる日次・週次ファイルをファイル名順に（同じ日付に両形式あれば Parquet）"""
+    stems = {}
+    for suffix in STORAGE_FORMATS.values():
+        for path in Path(directory).glob(f"{prefix}*{suffix}"):
+            stems.setdefault(path.stem, path)
+    return [find_rss_file(directory, stem) for stem in sorted(stems)]
+
+
+def write_rss(data, directory, stem, storage=None):
+    """日次・週次データを保存 → 保存したパス
+
+    途中で落ちても壊れないように一時ファイル経由で置き換え、同じ日付の別形式のファイルは削除する
+    （読み込み側は Parquet を優先するので、古い方が残ると再実行の結果が読まれない）
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    path = write_rss_file(data, directory / f"{stem}{STORAGE_FORMATS[storage_format(storage)]}")
+
+    for suffix in STORAGE_FORMATS.values():
+        other = directory / f"{stem}{suffix}"
+        if other != path:
+            other.unlink(missing_ok=True)
+    return path
+
+
+def write_rss_file(data, path):
+    """拡張子の形式で1ファイル保存（一時ファイル経由で置き換え）→ path"""
+    path = Path(path)
+    tmp_path = path.with_suffix(".tmp")
+    if path.suffix == STORAGE_FORMATS["parquet"]:
+        _write_parquet(data, tmp_path)
+    else:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+    tmp_path.replace(path)
+    return path
+
+
+def load_rss(path):
+    """ファイル全体を元の dict として読み込み（形式の変換・比較用）"""
+    if Path(path).suffix == STORAGE_FORMATS["parquet"]:
+        return _read_parquet(path)
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _write_parquet(data, path):
+    """dict → Parquet（記事を行、記事の項目を列に。それ以外はメタデータ）"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    # トップレベルの項目は順序ごと保存（sites の位置は None で示す）
+    header = {key: (None if key == "sites" else value) for key, value in data.items()}
+    site_infos = {}  # サイト名 → 記事以外の項目（週次形式は None、articles の位置は None で示す）
+    site_names = []
+    articles = []
+    for site_name, site in data.get("sites", {}).items():
+        if isinstance(site, list):
+            site_infos[site_name] = None
+            site_articles = site
+        else:
+            site_infos[site_name] = {key: (None if key == "articles" else value) for key, value in site.items()}
+            site_articles = site.get("articles", [])
+        site_names.extend([site_name] * len(site_articles))
+        articles.extend(site_articles)
+
+    fields = {}
+    for article in articles:
+        fields.update(dict.fromkeys(article))
+    if SITE_COLUMN in fields:
+        raise ValueError(f"Article field '{SITE_COLUMN}' conflicts with the site column")
+    if any(field.startswith(PRESENCE_PREFIX) for field in fields):
+        raise ValueError(f"Article fields must not start with '{PRESENCE_PREFIX}'")
+
+    columns = {SITE_COLUMN: pa.array(site_names, type=pa.string()).dictionary_encode()}
+    optional = []  # null = 項目なしの列
+    presence = {}  # 列 → 項目の有無の列
+    for field in fields:
+        values = [article.get(field) for article in articles]
+        columns[field] = pa.array(values)
+        present = [field in article for article in articles]
+        if all(present):
+            continue
+        if any(value is None and has_field for value, has_field in zip(values, present)):
+            presence[field] = f"{PRESENCE_PREFIX}{field}"
+            columns[presence[field]] = pa.array(present, type=pa.bool_())
+        else:
+            optional.append(field)
+    metadata = {
+        "version": PARQUET_FORMAT_VERSION, "header": header, "sites": site_infos,
+        "optional": optional, "presence": presence,
+    }
+    table = pa.table(columns).replace_schema_metadata(
+        {PARQUET_METADATA_KEY: json.dumps(metadata, ensure_ascii=False).encode('utf-8')}
+    )
+    # 辞書エンコードはサイト名だけ（タイトル・本文はほぼ重複しないので辞書が無駄になる）、統計も照会しないので省略
+    pq.write_table(
+        table, path, compression="zstd", compression_level=PARQUET_ZSTD_LEVEL,
+        use_dictionary=[SITE_COLUMN], data_page_size=PARQUET_PAGE_SIZE, write_statistics=False,
+    )
+
+
+def _read_parquet(path):
+    """Parquet → 保存前と同じ dict（項目がなかった記事には項目を持たせない）"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    # read_table（データセット API）より1ファイルの読み込みが速い
+    table = pq.ParquetFile(path).read(use_threads=False)
+    metadata = json.loads(table.schema.metadata[PARQUET_METADATA_KEY])
+    version = metadata.get("version")
+    if version not in (1, PARQUET_FORMAT_VERSION):
+        raise ValueError(f"Unsupported RSS parquet version {version} in {path}")
+
+    presence = metadata.get("presence", {})
+    fields = [name for name in table.column_names if name != SITE_COLUMN and not name.startswith(PRESENCE_PREFIX)]
+    # 版 1 は null の値を保存しないので、どの列も null = 項目なし
+    optional = set(fields if version == 1 else metadata["optional"])
+
+    # 文字列列は to_numpy の方が to_pylist より速い（null は None、数値列は NaN になるので to_pylist）
+    columns = [
+        table.column(name).to_numpy() if pa.types.is_string(table.schema.field(name).type)
+        else table.column(name).to_pylist()
+        for name in fields
+    ]
+    articles = [dict(zip(fields, row)) for row in zip(*columns)]
+
+    # 項目がなかった記事から項目を除く（null のない列・有無の列がない列はそのまま）
+    for index, field in enumerate(fields):
+        if field in presence:
+            for article, present in zip(articles, table.column(presence[field]).to_pylist()):
+                if not present:
+                    del article[field]
+        elif field in optional and table.column(field).null_count:
+            for article, value in zip(articles, columns[index]):
+                if value is None:
+                    del article[field]
+
+    # 記事はサイトごとに連続して保存しているので、サイト名の辞書の添字が同じ区間ごとに切り出す
+    sites_column = table.column(SITE_COLUMN).combine_chunks()
+    site_names = sites_column.dictionary.to_pylist()
+    articles_by_site = {}
+    start = 0
+    for index, run in itertools.groupby(sites_column.indices.to_pylist()):
+        end = start + sum(1 for _ in run)
+        articles_by_site.setdefault(site_names[index], []).extend(articles[start:end])
+        start = end
+
+    sites = {}
+    for site_name, info in metadata["sites"].items():
+        articles = articles_by_site.get(site_name, [])
+        if info is None:
+            sites[site_name] = articles
+        else:
+            sites[site_name] = {key: (articles if key == "articles" else value) for key, value in info.items()}
+    return {key: (sites if key == "sites" else value) for key, value in metadata["header"].items()}
+
+
+def _iter_parquet_sites(path, header):
+    """iter_rss_sites の Parquet 版"""
+    data = _read_parquet(path)
+    if header is not None:
+        header.update((key, value) for key, value in data.items() if key != "sites")
+    for site_name, site in data.get("sites", {}).items():
+        if isinstance(site, list):
+            yield site_name, {}, site
+            continue
+        site_info = {key: value for key, value in site.items() if key != "articles"}
+        yield site_name, site_info, site.get("articles", [])
@@ -0,0 +1,68 @@
+"""
+収集済み記事IDの索引（日次収集で新着記事だけを保存するため）
+- 記事ID（サイト名・タイトル・リンクの md5 先頭8桁）を初出の収集日ごとにまとめて保存
+- 保持期間を過ぎた日付の分は削除（期間を超えてフィードに残る記事は再び新着として保存される）
+- 1日1行の JSON なので、日次データと一緒にコミットしても差分は当日分の1行だけ
+"""
+
+import json
+from datetime import datetime, timedelta
+from pathlib import Path
+
+SEEN_PATH = Path("data/rss/seen_ids.json")
+SEEN_WINDOW_DAYS = 14  # 週次集約（7日）より長くして、同じ記事が1つの週に2回入らないようにする
+
+
+class SeenIndex:
+    """記事ID → 初出の収集日（保存形式は {収集日: "ID ID ..."}）"""
+
+    def __init__(self, path=SEEN_PATH, collection_date=None, window_days=SEEN_WINDOW_DAYS):
+        self.path = Path(path)
+        self.collection_date = collection_date or datetime.now().strftime('%Y-%m-%d')
+        self.window_days = window_days
+        self.first_seen = {}
+        if self.path.exists():
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    dates = json.load(f).get('dates', {})
+            except (OSError, ValueError) as e:
+                print(f"Warning: failed to load {self.path}: {e}")
+                dates = {}
+            for date, ids in sorted(dates.items()):
+                for article_id in ids.split():
+                    self.first_seen.setdefault(article_id, date)
+        self.prune()
+
+    def prune(self):
+        """保持期間より前に初出の記事IDを削除"""
+        oldest = datetime.strptime(self.collection_date, '%Y-%m-%d') - timedelta(days=self.window_days)
+        oldest = oldest.strftime('%Y-%m-%d')
+        self.first_seen = {
+            article_id: date for article_id, date in self.first_seen.items() if date >= oldest
+        }
+
+    def is_new(self, article_id):
+        """前日以前の収集で保存していない記事か（同日の再実行では当日分を新着のまま扱う）"""
+        return self.first_seen.get(article_id, self.collection_date) >= self.collection_date
+
+    def add(self, article_id):
+        """今回保存した記事IDを記録（既に記録済みなら初出日のまま）"""
+        self.first_seen.setdefault(article_id, self.collection_date)
+
+    def save(self):
+        """JSON保存（途中で落ちても壊れないように一時ファイル経由）"""
+        dates = {}
+        for article_id, date in self.first_seen.items():
+            dates.setdefault(date, []).append(article_id)
+        data = {
+            'window_days': self.window_days,
+            'dates': {date: " ".join(sorted(ids)) for date, ids in sorted(dates.items())},
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=1)
+        tmp_path.replace(self.path)
+
+    def __len__(self):
+        return len(self.first_seen)